@@ -0,0 +1,122 @@
+import os
+from collections import deque
+
+
+ACTIVITY_WINDOW = float(os.getenv("ACTIVITY_WINDOW", "900"))
+MAX_ACTIVITY_EVENTS = int(os.getenv("MAX_ACTIVITY_EVENTS", "100000"))
+
+
+class ContractActivity:
+    __slots__ = ("events", "whale_counts", "total_usd")
+
+    def __init__(self):
+        self.events = deque()
+        self.whale_counts = {}
+        self.total_usd = 0.0
+
+
+class WhaleActivity:
+    __slots__ = ("events", "total_usd")
+
+    def __init__(self):
+        self.events = deque()
+        self.total_usd = 0.0
+
+
+class ActivityStore:
+    # Whale buys from the last `window` seconds, indexed by contract and by whale. Every index is a
+    # deque in arrival order, so the globally oldest event is always at the left of its contract's and
+    # whale's deques and eviction is O(1). Keys are dropped once empty, which keeps memory bounded by
+    # max_events no matter how long the bot runs.
+    def __init__(self, window=ACTIVITY_WINDOW, max_events=MAX_ACTIVITY_EVENTS):
+        self.window = window
+        self.max_events = max_events
+        self.events = deque()
+        self.seen_ids = set()
+        self.by_contract = {}
+        self.by_whale = {}
+        self.latest = 0.0
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, transaction):
+        if transaction.id is not None:
+            if transaction.id in self.seen_ids:
+                return False
+            self.seen_ids.add(transaction.id)
+
+        amount = transaction.amount or 0.0
+        event = (transaction.epoch, transaction.id, transaction.contract_address, transaction.whale_key, amount)
+        self.events.append(event)
+
+        contract = self.by_contract.get(event[2])
+        if contract is None:
+            contract = self.by_contract[event[2]] = ContractActivity()
+        contract.events.append(event)
+        contract.whale_counts[event[3]] = contract.whale_counts.get(event[3], 0) + 1
+        contract.total_usd += amount
+
+        whale = self.by_whale.get(event[3])
+        if whale is None:
+            whale = self.by_whale[event[3]] = WhaleActivity()
+        whale.events.append(event)
+        whale.total_usd += amount
+
+        if transaction.epoch > self.latest:
+            self.latest = transaction.epoch
+        self.prune()
+        return True
+
+    def prune(self):
+        cutoff = self.latest - self.window
+        events = self.events
+        while events and (events[0][0] < cutoff or len(events) > self.max_events):
+            self.evict(events.popleft())
+
+    def evict(self, event):
+        _, transaction_id, contract_address, whale_key, amount = event
+        self.seen_ids.discard(transaction_id)
+
+        contract = self.by_contract[contract_address]
+        contract.events.popleft()
+        remaining = contract.whale_counts[whale_key] - 1
+        if remaining:
+            contract.whale_counts[whale_key] = remaining
+        else:
+            del contract.whale_counts[whale_key]
+        contract.total_usd -= amount
+        if not contract.events:
+            del self.by_contract[contract_address]
+
+        whale = self.by_whale[whale_key]
+        whale.events.popleft()
+        whale.total_usd -= amount
+        if not whale.events:
+            del self.by_whale[whale_key]
+
+    def recent_contract_events(self, contract_address, seconds, now=None):
+        contract = self.by_contract.get(contract_address)
+        if contract is None:
+            return []
+        cutoff = (now if now is not None else self.latest) - seconds
+        return [event for event in contract.events if event[0] >= cutoff]
+
+    def distinct_whales(self, contract_address, seconds=None, now=None):
+        # The full window is kept up to date incrementally; shorter windows scan the token's few events
+        if seconds is None or seconds >= self.window:
+            contract = self.by_contract.get(contract_address)
+            return len(contract.whale_counts) if contract is not None else 0
+        return len({event[3] for event in self.recent_contract_events(contract_address, seconds, now)})
+
+    def contract_inflow(self, contract_address, seconds=None, now=None):
+        if seconds is None or seconds >= self.window:
+            contract = self.by_contract.get(contract_address)
+            return contract.total_usd if contract is not None else 0.0
+        return sum(event[4] for event in self.recent_contract_events(contract_address, seconds, now))
+
+    def whale_activity(self, whale_key):
+        whale = self.by_whale.get(whale_key)
+        if whale is None:
+            return 0, 0.0
+        return len(whale.events), whale.total_usd
@@ -0,0 +1,271 @@
+import os
+import glob
+import gzip
+import time
+import zlib
+import bisect
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+# Before the imports below: the grid defaults and RULES_FILE come from the live bot's .env
+load_dotenv()
+
+from prettytable import PrettyTable
+from transaction import Transaction, json_loads
+from rules import compile_rules, merge_config, RULES_FILE
+from activity_store import ActivityStore
+
+
+BACKTEST_HORIZON = float(os.getenv("BACKTEST_HORIZON", "3600"))
+
+# Per process: filled by the parent before the pool forks, or by init_worker where processes are spawned
+transactions = []
+price_paths = {}
+base_config = {}
+
+
+def recording_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "*.jsonl.gz")) + glob.glob(os.path.join(path, "*.jsonl")))
+        else:
+            files.append(path)
+    return files
+
+
+def read_recording(filename):
+    # A run killed mid-write leaves a gzip member without its trailer and maybe half a line; the records
+    # before the damage are still good
+    opener = gzip.open if filename.endswith(".gz") else open
+    try:
+        with opener(filename, "rb") as file:
+            for line in file:
+                if line.strip():
+                    yield json_loads(line)
+    except (EOFError, OSError, zlib.error, ValueError) as e:
+        print(f"{filename} is truncated, replaying the records before that: {e}")
+
+
+def read_recordings(paths):
+    for filename in recording_files(paths):
+        yield from read_recording(filename)
+
+
+def load_recordings(paths):
+    # Deduped by id and replayed in whale-timestamp order, the order the live bot would have seen them in
+    loaded = []
+    seen_ids = set()
+    for data in read_recordings(paths):
+        transaction = Transaction.from_api(data)
+        if transaction is None or transaction.amount is None or transaction.market_cap is None:
+            continue
+        if transaction.id is not None:
+            if transaction.id in seen_ids:
+                continue
+            seen_ids.add(transaction.id)
+        loaded.append(transaction)
+    loaded.sort(key=lambda transaction: transaction.epoch)
+    return loaded
+
+
+def build_price_paths(replay):
+    # Every recorded whale buy doubles as a market cap observation of its token
+    paths = {}
+    for transaction in replay:
+        path = paths.get(transaction.contract_address)
+        if path is None:
+            path = paths[transaction.contract_address] = ([], [])
+        path[0].append(transaction.epoch)
+        path[1].append(transaction.market_cap)
+    return paths
+
+
+def init_worker(paths, config):
+    global transactions, price_paths, base_config
+    base_config = config
+    if not transactions:
+        transactions = load_recordings(paths)
+        price_paths = build_price_paths(transactions)
+
+
+def simulate_exit(contract_address, entry_epoch, entry_market_cap, take_profit, stop_loss, horizon):
+    # Walks the token's later observations until a level is crossed or the horizon ends. Take-profit fills
+    # at the level itself (the tracker would have sold on the way up); stop-loss fills at the observed gap.
+    # Returns None when the token was never seen again, so its outcome is unknown.
+    epochs, market_caps = price_paths[contract_address]
+    start = bisect.bisect_right(epochs, entry_epoch)
+    end = bisect.bisect_right(epochs, entry_epoch + horizon, start)
+    multiple = None
+    for index in range(start, end):
+        multiple = market_caps[index] / entry_market_cap
+        if take_profit and multiple >= take_profit:
+            return take_profit
+        if stop_loss and multiple <= stop_loss:
+            return multiple
+    return multiple
+
+
+def run_combo(combo):
+    min_amount, max_market_cap, min_whales, confluence_seconds, take_profit, stop_loss, horizon = combo
+    config = merge_config(base_config, {"defaults": {
+        "min_amount": min_amount,
+        "max_market_cap": max_market_cap,
+        "min_whales": min_whales,
+        "confluence_seconds": confluence_seconds,
+    }})
+    # Same decision path as check_and_buy_coin: activity store first, compiled rules, one buy per coin.
+    # The store is only needed (and only paid for) when confluence is part of the rules; its window is the
+    # widest confluence window, so the default one is answered from the incremental counts without a scan.
+    rules = config.get("rules", [])
+    activity = None
+    if max([min_whales, *(int(rule.get("min_whales", 1)) for rule in rules)]) > 1:
+        activity = ActivityStore(max([confluence_seconds, *(float(rule.get("confluence_seconds", 0)) for rule in rules)]))
+    evaluate = compile_rules(config, activity)
+    bought = set()
+    totals = [0, 0, 0, 0.0, 0.0]  # buys, priced, hits, sum of multiples, PnL in SOL
+    by_whale = {}
+
+    for transaction in transactions:
+        if activity is not None:
+            activity.add(transaction)
+        sol_amount = evaluate(transaction)
+        if sol_amount is None or transaction.contract_address in bought:
+            continue
+        bought.add(transaction.contract_address)
+
+        whale = by_whale.get(transaction.whale_key)
+        if whale is None:
+            whale = by_whale[transaction.whale_key] = [0, 0, 0, 0.0, 0.0]
+        multiple = simulate_exit(
+            transaction.contract_address, transaction.epoch, transaction.market_cap, take_profit, stop_loss, horizon
+        )
+        for stats in (totals, whale):
+            stats[0] += 1
+            if multiple is not None:
+                stats[1] += 1
+                stats[2] += multiple > 1
+                stats[3] += multiple
+                stats[4] += sol_amount * (multiple - 1)
+    return combo, totals, by_whale
+
+
+def parse_list(kind):
+    return lambda value: [kind(item) for item in value.split(",") if item.strip()]
+
+
+def format_stats(stats):
+    buys, priced, hits, multiples, pnl = stats
+    return [
+        buys,
+        priced,
+        f"{hits / priced:.1%}" if priced else "-",
+        f"{multiples / priced:.2f}x" if priced else "-",
+        f"{pnl:+.4f}",
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded whalewatch transactions through the buy rules over a parameter grid.")
+    parser.add_argument("recordings", nargs="+", help="recorded .jsonl.gz / .jsonl files or directories of them")
+    # Axes left out stay at the live bot's value: the rules file's defaults, else the .env
+    parser.add_argument("--min-amount", type=parse_list(float))
+    parser.add_argument("--max-market-cap", type=parse_list(float))
+    parser.add_argument("--min-whales", type=parse_list(int))
+    parser.add_argument("--confluence-seconds", type=parse_list(float))
+    parser.add_argument("--take-profit", type=parse_list(float), default=[float(os.getenv("TAKE_PROFIT_MULTIPLE", "0"))], help="multiples, 0 = off")
+    parser.add_argument("--stop-loss", type=parse_list(float), default=[float(os.getenv("STOP_LOSS_MULTIPLE", "0"))], help="multiples, 0 = off")
+    parser.add_argument("--horizon", type=parse_list(float), default=[BACKTEST_HORIZON], help="seconds a position is held at most")
+    parser.add_argument("--sol-amount", type=float, help="overrides the live SOL amount of every rule")
+    parser.add_argument("--blacklist", help="comma separated whale names to skip, on top of the .env and rules file blacklists")
+    parser.add_argument(
+        "--rules", default=RULES_FILE if os.path.exists(RULES_FILE) else None,
+        help="rules file (see rules.example.json) merged under the grid values; defaults to RULES_FILE, '' for none",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--top", type=int, default=20, help="parameter sets to show")
+    return parser.parse_args()
+
+
+def main():
+    global transactions, price_paths
+    args = parse_args()
+
+    # Built like main's RuleEngine: the .env buy criteria with the rules file on top
+    config = {
+        "defaults": {
+            "min_amount": float(os.getenv("WHALE_USD_AMOUNT", "700")),
+            "max_market_cap": float(os.getenv("MAX_WHALE_COIN_MARKETCAP", "200000")),
+            "sol_amount": float(os.getenv("SOL_AMOUNT", "0.005")),
+            "min_whales": int(os.getenv("MIN_CONFLUENCE_WHALES", "1")),
+            "confluence_seconds": float(os.getenv("CONFLUENCE_SECONDS", "300")),
+        },
+        "deny_whales": [name for name in os.getenv("WHALE_NAMES_BLACKLIST", "").split(",") if name.strip()],
+    }
+    if args.rules:
+        with open(args.rules, "rb") as file:
+            config = merge_config(config, json_loads(file.read()))
+        print(f"Replaying with the rules from {args.rules}.")
+    # Command line options go on last so the rules file can't drop them
+    if args.blacklist is not None:
+        config = merge_config(config, {"deny_whales": [name for name in args.blacklist.split(",") if name.strip()]})
+    if args.sol_amount is not None:
+        config = merge_config(config, {"defaults": {"sol_amount": args.sol_amount}})
+        for rule in config.get("rules", []):
+            rule.pop("sol_amount", None)
+    defaults = config["defaults"]
+    min_amounts = args.min_amount or [float(defaults["min_amount"])]
+    max_market_caps = args.max_market_cap or [float(defaults["max_market_cap"])]
+    min_whales = args.min_whales or [int(defaults["min_whales"])]
+    confluence_seconds = args.confluence_seconds or [float(defaults["confluence_seconds"])]
+
+    started = time.perf_counter()
+    init_worker(args.recordings, config)
+    print(f"Loaded {len(transactions):,} transactions on {len(price_paths):,} tokens in {time.perf_counter() - started:.1f}s.")
+    if not transactions:
+        return
+
+    # Confluence windows only matter when more than one whale is required
+    combos = [
+        combo for combo in itertools.product(
+            min_amounts, max_market_caps, min_whales, confluence_seconds, args.take_profit, args.stop_loss, args.horizon
+        )
+        if combo[2] > 1 or combo[3] == confluence_seconds[0]
+    ]
+    workers = max(1, min(args.workers or 1, len(combos)))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(args.recordings, config)) as executor:
+        results = list(executor.map(run_combo, combos, chunksize=max(1, len(combos) // (workers * 4))))
+    elapsed = time.perf_counter() - started
+    print(
+        f"Replayed {len(combos)} parameter sets on {workers} processes in {elapsed:.1f}s "
+        f"({len(combos) * len(transactions) / elapsed:,.0f} transaction decisions per second)."
+    )
+
+    results.sort(key=lambda result: result[1][4], reverse=True)
+    table = PrettyTable()
+    table.field_names = [
+        "Min Amount", "Max Market Cap", "Min Whales", "Confluence (s)", "Take Profit", "Stop Loss", "Horizon (s)",
+        "Buys", "Priced", "Hit Rate", "Avg Multiple", "PnL (SOL)",
+    ]
+    for combo, totals, _ in results[:args.top]:
+        min_amount, max_market_cap, min_whales, confluence_seconds, take_profit, stop_loss, horizon = combo
+        table.add_row([
+            f"${min_amount:,.0f}", f"${max_market_cap:,.0f}", min_whales, f"{confluence_seconds:g}" if min_whales > 1 else "-",
+            f"{take_profit:g}x" if take_profit else "off", f"{stop_loss:g}x" if stop_loss else "off", f"{horizon:g}",
+            *format_stats(totals),
+        ])
+    print(table)
+
+    # Whales that lose money under the best parameters are the blacklist candidates
+    whales = PrettyTable()
+    whales.field_names = ["Which Whale?", "Buys", "Priced", "Hit Rate", "Avg Multiple", "PnL (SOL)"]
+    for whale, stats in sorted(results[0][2].items(), key=lambda item: item[1][4])[:args.top]:
+        whales.add_row([whale, *format_stats(stats)])
+    print(f"Whales by PnL under the best parameter set:\n{whales}")
+
+
+if __name__ == "__main__":
+    main()
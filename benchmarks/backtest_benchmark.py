@@ -0,0 +1,56 @@
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+
+def write_recording(filename, count, tokens, whales):
+    # Tokens get a random-walk market cap and a burst of whale buys, roughly the shape of the real feed
+    epoch = 1735387200.0
+    market_caps = [random.uniform(5000, 300000) for _ in range(tokens)]
+    with gzip.open(filename, "wb") as file:
+        for index in range(count):
+            epoch += random.expovariate(5)
+            token = int(random.paretovariate(1.2)) % tokens
+            market_caps[token] = max(1000.0, market_caps[token] * random.lognormvariate(0, 0.15))
+            data = {
+                "id": f"bench-{index}",
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)),
+                "swap_whalewatch_list": {"name": f"Whale {random.randrange(whales)}"},
+                "swap_token": {"symbol": f"SYM{token}", "token_address": f"Bench{token:0>36}pump"},
+                "trade_amount_rounded": round(random.uniform(50, 5000), 2),
+                "token_market_cap": round(market_caps[token], 2),
+                "recorded_at": epoch,
+            }
+            file.write(json.dumps(data).encode() + b"\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wall time of a backtest sweep over a synthetic recording.")
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--whales", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "whalewatch-bench.jsonl.gz")
+        started = time.perf_counter()
+        write_recording(filename, args.transactions, args.tokens, args.whales)
+        print(f"Wrote {args.transactions:,} synthetic transactions in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        subprocess.run([
+            sys.executable, "backtest.py", filename,
+            "--min-amount", "300,700,1500", "--max-market-cap", "100000,200000",
+            "--min-whales", "1,2", "--confluence-seconds", "60,300",
+            "--take-profit", "1.5,2,3", "--stop-loss", "0.5,0.7",
+            "--workers", str(args.workers), "--top", "5",
+        ], check=True)
+        print(f"Backtest sweep finished in {time.perf_counter() - started:.1f}s")
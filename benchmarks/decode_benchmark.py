@@ -0,0 +1,80 @@
+import json
+import timeit
+import argparse
+from datetime import datetime
+from benchmarks.fake_whalewatch import make_transaction
+from transaction import decode_transactions
+
+WHALE_USD_AMOUNT = 700
+MAX_WHALE_COIN_MARKETCAP = 200000
+
+
+def make_body(count):
+    transactions = []
+    for index in range(count):
+        transaction = make_transaction(index, amount=350.0 + index * 37.5, market_cap=20000.0 + index * 9000.0)
+        transaction["timestamp"] = "2024-12-28T12:00:00"
+        transactions.append(transaction)
+    return json.dumps({"transactions": transactions}).encode()
+
+
+def legacy_round(value):
+    if value != "Unknown" and value is not None:
+        return round(value, 2)
+    return "Unknown"
+
+
+def decode_and_filter_dicts(body):
+    # The per-transaction work main.py did before Transaction existed: each consumer dug into
+    # the raw dict, re-rounded the numbers and parsed the timestamp on its own
+    decisions = 0
+    for transaction in json.loads(body)["transactions"]:
+        datetime.strptime(transaction.get("timestamp"), "%Y-%m-%dT%H:%M:%S")
+        amount = transaction.get("trade_amount_rounded")
+        market_cap = legacy_round(transaction.get("token_market_cap", "Unknown"))
+        row = (
+            transaction["swap_whalewatch_list"]["name"],
+            transaction["swap_token"]["symbol"],
+            f"${round(amount, 2) if amount is not None else 0.0:,.2f}",
+            f"${market_cap:,.2f}" if market_cap != "Unknown" else market_cap,
+            transaction["swap_token"]["token_address"],
+            transaction["timestamp"],
+        )
+        datetime.strptime(row[5], "%Y-%m-%dT%H:%M:%S")
+        transaction["swap_whalewatch_list"]["name"].upper().strip()
+        amount = transaction.get("trade_amount_rounded")
+        market_cap = transaction.get("token_market_cap")
+        transaction["swap_token"]["token_address"]
+        if amount >= WHALE_USD_AMOUNT and market_cap <= MAX_WHALE_COIN_MARKETCAP:
+            decisions += 1
+    return decisions
+
+
+def decode_and_filter_transactions(body):
+    decisions = 0
+    for transaction in decode_transactions(body):
+        row = (
+            transaction.whale_name,
+            transaction.symbol,
+            transaction.display_amount,
+            transaction.display_market_cap,
+            transaction.contract_address,
+            transaction.epoch,
+        )
+        transaction.whale_key
+        if transaction.amount >= WHALE_USD_AMOUNT and transaction.market_cap <= MAX_WHALE_COIN_MARKETCAP:
+            decisions += 1
+    return decisions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-transaction decode and filter cost, raw dicts vs Transaction.")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    body = make_body(args.page_size)
+    assert decode_and_filter_dicts(body) == decode_and_filter_transactions(body)
+    for label, function in (("raw dicts (before)", decode_and_filter_dicts), ("Transaction (after)", decode_and_filter_transactions)):
+        seconds = min(timeit.repeat(lambda: function(body), number=args.repeat, repeat=5))
+        print(f"{label:<22}{seconds / (args.repeat * args.page_size) * 1e6:>8.2f} us per transaction")
@@ -0,0 +1,180 @@
+import time
+import random
+import asyncio
+import itertools
+from types import SimpleNamespace
+from pyrogram.handlers import EditedMessageHandler
+from telegram_bot import ResponseDispatcher
+from rate_limiter import TelegramGateway
+
+
+CA_PREFIX = "/start=ref_ibayi_ca_"
+
+
+def make_keyboard(rows):
+    return SimpleNamespace(inline_keyboard=[
+        [SimpleNamespace(text=text, callback_data=data) for text, data in row] for row in rows
+    ])
+
+
+class FakeBonkBot:
+    # Plays BonkBot's side of the buy, sell and limit-order conversations with configurable reply delays.
+    # drop_rate is the share of button clicks it silently ignores, to exercise the trade flow's retries.
+    def __init__(self, reply_delay=0.3, jitter=0.1, drop_rate=0.0):
+        self.reply_delay = reply_delay
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.dropped = 0
+        self.ca_received = {}
+        self.buy_received = {}
+        self.sell_received = {}
+
+    async def delay(self):
+        await asyncio.sleep(max(0.0, random.uniform(self.reply_delay - self.jitter, self.reply_delay + self.jitter)))
+
+    async def on_message(self, client, chat_id, message, reply_to):
+        text = message.text
+        prompt = client.prompts.get(reply_to)
+
+        if text.startswith(CA_PREFIX):
+            contract_address = text[len(CA_PREFIX):]
+            self.ca_received.setdefault(contract_address, time.perf_counter())
+            await self.delay()
+            await client.deliver(
+                chat_id, f"Fake Token | FAKE\n{contract_address}\nPrice: $0.0001",
+                make_keyboard([[("Buy 1.0 SOL", "buy_1"), ("Buy X SOL", "buy_x")], [("Sell 100%", "sell_100"), ("Sell X %", "sell_x")]]),
+                contract_address
+            )
+        elif prompt and prompt[0] == "amount":
+            self.buy_received.setdefault(prompt[1], time.perf_counter())
+            await self.delay()
+            await client.deliver(
+                chat_id, f"Buy successful!\n{prompt[1]}\nProfit: 0.00%",
+                make_keyboard([[("Sell 100%", "sell_100"), ("Limit", "limit")]]), prompt[1]
+            )
+        elif prompt and prompt[0] == "sell_percent":
+            self.sell_received.setdefault(prompt[1], time.perf_counter())
+            await self.delay()
+            await client.deliver(chat_id, f"Sell successful!\n{prompt[1]}", context=prompt[1])
+        elif prompt and prompt[0] == "percent":
+            await self.delay()
+            await client.deliver(chat_id, "Enter a trigger price or multiple", context=prompt[1], prompt="trigger")
+        elif prompt and prompt[0] == "trigger":
+            await self.delay()
+            await client.deliver(
+                chat_id, f"Take Profit Sell {text}\nPlease confirm", make_keyboard([[("Confirm", "confirm")]]), prompt[1]
+            )
+
+    async def on_callback(self, client, chat_id, message, data):
+        if random.random() < self.drop_rate:
+            self.dropped += 1
+            return
+        await self.delay()
+        if data == "buy_x":
+            await client.deliver(chat_id, "Reply with the amount you wish to buy", context=message.context, prompt="amount")
+        elif data == "sell_100":
+            self.sell_received.setdefault(message.context, time.perf_counter())
+            await client.deliver(chat_id, f"Sell successful!\n{message.context}", context=message.context)
+        elif data == "sell_x":
+            await client.deliver(chat_id, "Reply with the % you wish to sell", context=message.context, prompt="sell_percent")
+        elif data == "limit":
+            await client.deliver(
+                chat_id, message.text, make_keyboard([[("Limit Sell X %", "limit_sell_x")]]), message.context, edit=message
+            )
+        elif data == "limit_sell_x":
+            await client.deliver(chat_id, "Reply with the % you wish to limit sell", context=message.context, prompt="percent")
+        elif data == "confirm":
+            await client.deliver(chat_id, "Limit order successfully placed", context=message.context)
+
+
+class FakeTelegramClient:
+    # Implements the slice of pyrogram.Client the bot uses; every RPC costs rpc_delay seconds
+    def __init__(self, name, bot, rpc_delay=0.05):
+        self.name = name
+        self.bot = bot
+        self.rpc_delay = rpc_delay
+        self.handlers = []
+        self.history = {}
+        self.prompts = {}
+        self.tasks = set()
+        self.message_ids = itertools.count(1)
+        self.user = SimpleNamespace(is_bot=False, username=name)
+
+    def add_handler(self, handler, group=0):
+        self.handlers.append(handler)
+
+    async def start(self):
+        await asyncio.sleep(self.rpc_delay)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def store(self, chat_id, message):
+        history = self.history.setdefault(chat_id, [])
+        for index, existing in enumerate(history):
+            if existing.id == message.id:
+                history[index] = message
+                return
+        history.append(message)
+
+    async def deliver(self, chat_id, text, reply_markup=None, context=None, prompt=None, edit=None):
+        message = SimpleNamespace(
+            id=edit.id if edit is not None else next(self.message_ids),
+            text=text,
+            caption=None,
+            outgoing=False,
+            from_user=SimpleNamespace(is_bot=True, username=chat_id),
+            chat=SimpleNamespace(username=chat_id),
+            reply_markup=reply_markup,
+            context=context,
+        )
+        self.store(chat_id, message)
+        if prompt:
+            self.prompts[message.id] = (prompt, context)
+        for handler in self.handlers:
+            if isinstance(handler, EditedMessageHandler) == (edit is not None):
+                await handler.callback(self, message)
+
+    async def send_message(self, chat_id, text, reply_to_message_id=None):
+        await asyncio.sleep(self.rpc_delay)
+        message = SimpleNamespace(
+            id=next(self.message_ids), text=text, caption=None, outgoing=True, from_user=self.user,
+            chat=SimpleNamespace(username=chat_id), reply_markup=None, context=None,
+        )
+        self.store(chat_id, message)
+        self.spawn(self.bot.on_message(self, chat_id, message, reply_to_message_id))
+        return message
+
+    async def get_chat_history(self, chat_id, limit=0):
+        await asyncio.sleep(self.rpc_delay)
+        messages = self.history.get(chat_id, [])[::-1]
+        for message in messages[:limit] if limit else messages:
+            yield message
+
+    async def resolve_peer(self, peer_id):
+        await asyncio.sleep(self.rpc_delay)
+        return SimpleNamespace(user_id=hash(peer_id))
+
+    async def request_callback_answer(self, chat_id, message_id, callback_data):
+        await asyncio.sleep(self.rpc_delay)
+        message = next((m for m in self.history.get(chat_id, []) if m.id == message_id), None)
+        if message is None:
+            raise ValueError(f"Message {message_id} not found in {chat_id}")
+        self.spawn(self.bot.on_callback(self, chat_id, message, callback_data))
+        return SimpleNamespace(message=None)
+
+
+def make_client_factory(bot, rpc_delay=0.05):
+    def create_fake_client(session_name):
+        client = FakeTelegramClient(session_name, bot, rpc_delay)
+        client.response_dispatcher = ResponseDispatcher(client)
+        client.gateway = TelegramGateway(session_name)
+        return client
+    return create_fake_client
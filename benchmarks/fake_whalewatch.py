@@ -0,0 +1,95 @@
+import json
+import time
+import random
+import asyncio
+from datetime import datetime
+from aiohttp import web
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def make_transaction(index, amount=1000.0, market_cap=50000.0, whale_name=None):
+    return {
+        "id": f"fake-{index}",
+        "trade_amount_rounded": amount,
+        "token_market_cap": market_cap,
+        "swap_token": {"symbol": f"FAKE{index}", "token_address": f"Fake{index:0>36}pump"},
+        "swap_whalewatch_list": {"name": whale_name or f"Whale {index % 7}"},
+    }
+
+
+def generate_script(rate, duration, burst=1):
+    # Bursts of `burst` buys land together, spaced so the average rate is `rate` buys per second
+    script = []
+    interval = burst / rate
+    offset = 0.0
+    while offset < duration:
+        for _ in range(burst):
+            script.append((offset, make_transaction(len(script))))
+        offset += interval
+    return script
+
+
+def load_script(filename):
+    # One transaction per line with an extra "offset" key: seconds since playback started
+    script = []
+    with open(filename, "r") as file:
+        for line in file:
+            if line.strip():
+                transaction = json.loads(line)
+                script.append((float(transaction.pop("offset")), transaction))
+    script.sort(key=lambda entry: entry[0])
+    return script
+
+
+class FakeWhalewatch:
+    # Every request takes api_delay; slow_fraction of them take 10x longer and throttle_fraction answer 429
+    def __init__(self, script, host="127.0.0.1", port=0, api_delay=0.0, slow_fraction=0.0, throttle_fraction=0.0):
+        self.script = script
+        self.api_delay = api_delay
+        self.slow_fraction = slow_fraction
+        self.throttle_fraction = throttle_fraction
+        self.host = host
+        self.port = port
+        self.visible = []
+        self.emitted_at = {}
+        self.requests = 0
+        self.runner = None
+
+    async def handle_list(self, request):
+        self.requests += 1
+        if random.random() < self.throttle_fraction:
+            return web.json_response({"error": "Too Many Requests"}, status=429)
+        delay = self.api_delay * (10 if random.random() < self.slow_fraction else 1)
+        if delay:
+            await asyncio.sleep(delay)
+        page = int(request.query.get("page", "1"))
+        limit = int(request.query.get("limit", "1"))
+        newest_first = self.visible[::-1]
+        transactions = newest_first[(page - 1) * limit:page * limit]
+        return web.json_response({"transactions": transactions})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self.handle_list)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}/api/api_v5/whalewatch/transactions/list"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def play(self):
+        started = time.perf_counter()
+        for offset, transaction in self.script:
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            transaction = dict(transaction, timestamp=datetime.utcnow().strftime(TIMESTAMP_FORMAT))
+            self.emitted_at[transaction["swap_token"]["token_address"]] = time.perf_counter()
+            self.visible.append(transaction)
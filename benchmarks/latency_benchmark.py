@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import argparse
+import asyncio
+import tempfile
+import contextlib
+
+# main and telegram_bot read their settings at import time, so the environment has to be ready first
+TEMP_DIR = tempfile.mkdtemp(prefix="whale-bench-")
+os.environ.setdefault("ACCESS_TOKEN", "benchmark")
+os.environ["CURSOR_FILE"] = os.path.join(TEMP_DIR, "cursor.json")
+os.environ.setdefault("TRACE_FILE", os.path.join(TEMP_DIR, "traces.jsonl"))
+os.environ["JOURNAL_FILE"] = os.path.join(TEMP_DIR, "trades.db")
+os.environ["SAVE_BOUGHT_COINS"] = "False"
+os.environ["HEADLESS"] = "True"
+os.environ.setdefault("PRICE_SOURCE", "off")
+# How long a click the fake bot dropped (--drop-rate) waits before it is retried
+os.environ.setdefault("TRADE_STEP_TIMEOUT", "2")
+
+from benchmarks.fake_whalewatch import FakeWhalewatch, generate_script, load_script
+from benchmarks.fake_bonkbot import FakeBonkBot, make_client_factory
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:,.0f} ms"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline end-to-end latency benchmark against a fake whalewatch API and fake BonkBot.")
+    parser.add_argument("--rate", type=float, default=1.0, help="whale buys per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of whale buys to play back")
+    parser.add_argument("--burst", type=int, default=1, help="whale buys emitted together in each burst")
+    parser.add_argument("--script", help="JSONL file of transactions with an 'offset' key, overrides --rate/--duration/--burst")
+    parser.add_argument("--sessions", type=int, default=1, help="fake Telegram sessions")
+    parser.add_argument("--bots", type=int, default=1, help="BonkBot instances per session")
+    parser.add_argument("--reply-delay", type=float, default=0.3, help="mean BonkBot reply delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="BonkBot reply delay jitter in seconds")
+    parser.add_argument("--rpc-delay", type=float, default=0.05, help="Telegram RPC round trip in seconds")
+    parser.add_argument("--api-delay", type=float, default=0.0, help="whalewatch response time in seconds")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of whalewatch responses that take 10x --api-delay")
+    parser.add_argument("--throttle-fraction", type=float, default=0.0, help="share of whalewatch requests answered with 429")
+    parser.add_argument("--limit-order", action="store_true", help="also run the limit order flow after each buy")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of button clicks BonkBot ignores, so they have to be retried")
+    parser.add_argument("--drain", type=float, default=10.0, help="seconds to wait for queued buys after playback")
+    parser.add_argument("--log", default=os.devnull, help="file that receives the bot's own output")
+    return parser.parse_args()
+
+
+async def run_benchmark(args):
+    script = load_script(args.script) if args.script else generate_script(args.rate, args.duration, args.burst)
+
+    whalewatch = FakeWhalewatch(script, api_delay=args.api_delay, slow_fraction=args.slow_fraction, throttle_fraction=args.throttle_fraction)
+    url = await whalewatch.start()
+
+    import main
+    from execution_pool import ExecutionPool
+    from telegram_bot import BOT_USERNAMES
+
+    bot = FakeBonkBot(args.reply_delay, args.jitter, args.drop_rate)
+    pool = ExecutionPool(
+        [f"bench{index}" for index in range(args.sessions)],
+        BOT_USERNAMES[:args.bots],
+        client_factory=make_client_factory(bot, args.rpc_delay),
+        limit_order=(100, 1.0) if args.limit_order else None,
+    )
+
+    with open(args.log, "w") as log, contextlib.redirect_stdout(log):
+        main_task = asyncio.create_task(main.main(pool, url))
+        # Let the pool start and the first poll land before the first whale buy is emitted
+        await asyncio.sleep(1.5)
+        playback_started = time.perf_counter()
+        await whalewatch.play()
+        playback_time = time.perf_counter() - playback_started
+        await asyncio.sleep(args.drain)
+        main_task.cancel()
+        await asyncio.gather(main_task, return_exceptions=True)
+    await whalewatch.stop()
+
+    expected = [
+        transaction["swap_token"]["token_address"]
+        for _, transaction in script
+        if transaction["trade_amount_rounded"] >= main.settings.whale_usd_amount
+        and transaction["token_market_cap"] <= main.settings.max_whale_coin_marketcap
+    ]
+    expected = list(dict.fromkeys(expected))
+    to_ca = [bot.ca_received[ca] - whalewatch.emitted_at[ca] for ca in expected if ca in bot.ca_received]
+    to_buy = [bot.buy_received[ca] - whalewatch.emitted_at[ca] for ca in expected if ca in bot.buy_received]
+
+    print(f"Played {len(script)} whale buys in {playback_time:.1f}s ({len(expected)} qualifying), "
+          f"{args.sessions} sessions x {args.bots} bots, {whalewatch.requests} API requests.")
+    print(f"{'Stage':<22}{'p50':>10}{'p95':>10}{'p99':>10}{'count':>8}")
+    for label, samples in (("Transaction -> CA", to_ca), ("Transaction -> buy", to_buy)):
+        print(f"{label:<22}{format_ms(percentile(samples, 50)):>10}{format_ms(percentile(samples, 95)):>10}"
+              f"{format_ms(percentile(samples, 99)):>10}{len(samples):>8}")
+    if args.drop_rate:
+        print(f"Dropped clicks: {bot.dropped}")
+    print(f"Missed transactions: {len(expected) - len(to_buy)}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_benchmark(parse_args()))
+    except KeyboardInterrupt:
+        sys.exit(1)
@@ -0,0 +1,47 @@
+import time
+import random
+import argparse
+from rules import compile_rules
+from transaction import Transaction
+
+
+def make_config(whale_count):
+    return {
+        "defaults": {"min_amount": 700, "max_market_cap": 200000, "sol_amount": 0.005},
+        "deny_whales": [f"Whale {index}" for index in range(0, whale_count, 10)],
+        "token_suffixes": ["pump"],
+        "rules": [
+            {"whales": [f"Whale {index}"], "min_amount": 500 + index, "max_market_cap": 100000 + index * 1000, "sol_amount": 0.01}
+            for index in range(1, whale_count, 3)
+        ],
+    }
+
+
+def make_transactions(count, whale_count):
+    return [
+        Transaction(
+            f"bench-{index}", "2024-12-28T12:00:00", 1735387200, f"Whale {random.randrange(whale_count)}", f"SYM{index}",
+            f"Bench{index:0>36}{'pump' if index % 4 else 'moon'}", round(random.uniform(50, 5000), 2), round(random.uniform(5000, 900000), 2),
+        )
+        for index in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the compiled buy rules.")
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--whales", type=int, default=500)
+    args = parser.parse_args()
+
+    random.seed(1)
+    transactions = make_transactions(args.transactions, args.whales)
+    started = time.perf_counter()
+    evaluate = compile_rules(make_config(args.whales))
+    compile_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matched = sum(1 for transaction in transactions if evaluate(transaction) is not None)
+    elapsed = time.perf_counter() - started
+    print(f"Compiled {args.whales} whale rules in {compile_time * 1000:.2f} ms")
+    print(f"Evaluated {len(transactions):,} transactions in {elapsed:.3f}s: {len(transactions) / elapsed:,.0f} per second, "
+          f"{elapsed / len(transactions) * 1e6:.2f} us each, {matched:,} matched")
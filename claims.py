@@ -0,0 +1,60 @@
+import time
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    account_group TEXT NOT NULL,
+    contract_address TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    bought INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_group, contract_address)
+);
+"""
+
+
+class ContractClaims:
+    # Cross-process "buy this coin once per account group". The primary key turns INSERT OR IGNORE into
+    # an atomic test-and-set across every process sharing the file; a claim is a single sub-millisecond
+    # write in WAL mode, so it runs inline on the event loop.
+    def __init__(self, filename, account_group, owner):
+        self.account_group = account_group
+        self.owner = owner
+        self.connection = sqlite3.connect(filename, isolation_level=None, timeout=5)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def claim(self, contract_address):
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO claims (account_group, contract_address, owner, claimed_at) VALUES (?, ?, ?, ?)",
+            (self.account_group, contract_address, self.owner, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def confirm(self, contract_address):
+        self.connection.execute(
+            "UPDATE claims SET bought = 1 WHERE account_group = ? AND contract_address = ? AND owner = ?",
+            (self.account_group, contract_address, self.owner),
+        )
+
+    def release_unconfirmed(self):
+        # Claims left in flight by a previous run of this worker (crash or restart) would block those coins for good
+        cursor = self.connection.execute(
+            "DELETE FROM claims WHERE account_group = ? AND owner = ? AND bought = 0", (self.account_group, self.owner)
+        )
+        return cursor.rowcount
+
+    def release(self, contract_address):
+        # Only our own claim: a failed buy hands the coin back to the group
+        self.connection.execute(
+            "DELETE FROM claims WHERE account_group = ? AND contract_address = ? AND owner = ?",
+            (self.account_group, contract_address, self.owner),
+        )
+
+    def reset(self):
+        self.connection.execute("DELETE FROM claims")
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,160 @@
+import os
+from collections import namedtuple
+from dotenv import load_dotenv
+
+# Loaded once, before any module reads its settings. Modules keep their tuning knobs as constants read
+# at import time, so this has to be imported ahead of them.
+load_dotenv()
+
+# Those tuning knobs, by type. The modules keep their own defaults; load_settings checks every one that is
+# set, so a typo is reported with all other problems instead of as a traceback from the module parsing it.
+TUNING_KNOBS = {
+    int: (
+        "BREAKER_THRESHOLD", "FEED_MAX_BUFFER", "FEED_PORT", "HEDGE_MIN_SAMPLES", "MAX_ACTIVITY_EVENTS", "METRICS_PORT",
+        "POLL_CONNECTIONS", "PRICE_BATCH_SIZE", "SELL_PERCENT", "SUPERVISOR_WORKERS", "TRACE_BACKUPS", "TRACE_MAX_BYTES",
+        "TRADE_STEP_RETRIES",
+    ),
+    float: (
+        "ACTIVITY_WINDOW", "BOT_BURST", "BOT_RATE", "BOT_RESPONSE_TIMEOUT", "BREAKER_COOLDOWN", "BUY_CONFIRM_TIMEOUT",
+        "DASHBOARD_REFRESH", "FEED_CONNECT_TIMEOUT", "FLOOD_RETRY_LIMIT", "HEDGE_PERCENTILE", "LATENCY_SMOOTHING",
+        "LOOP_LAG_INTERVAL", "LOOP_REPORT_INTERVAL", "MAX_ORDER_AGE", "POLL_INTERVAL", "POLL_MAX_INTERVAL",
+        "POLL_MIN_INTERVAL", "POLL_REPORT_INTERVAL", "POLL_TIMEOUT", "POSITION_REFRESH_INTERVAL", "PRICE_CACHE_TTL",
+        "PRICE_TIMEOUT", "PROFILE_INTERVAL", "RECORD_FLUSH_INTERVAL", "RULES_RELOAD_INTERVAL", "SESSION_BURST",
+        "SESSION_RATE", "SLOT_FAILURE_COOLDOWN", "SLOW_CALLBACK_THRESHOLD", "STOP_LOSS_MULTIPLE", "TAKE_PROFIT_MULTIPLE",
+        "TRADE_STEP_TIMEOUT", "WORKER_RESTART_DELAY", "WORKER_START_TIMEOUT", "WORKER_STOP_TIMEOUT",
+    ),
+}
+
+
+BOT_USERNAMES = [
+    "mcqueen_bonkbot",
+    "bonkbot_bot",
+    "monza_bonkbot",
+    "furiosa_bonkbot",
+    "neo_bonkbot",
+    "sonic_bonkbot"
+]
+
+Settings = namedtuple("Settings", [
+    "access_token", "whalewatch_url", "api_id", "api_hash", "sessions_dir", "sessions", "bot_usernames",
+    "whale_usd_amount", "max_whale_coin_marketcap", "sol_amount", "limit_order", "min_confluence_whales",
+    "confluence_seconds", "whale_names_blacklist", "save_bought_coins", "fetch_limit", "max_catchup_pages",
+    "max_catchup_seconds", "cursor_file", "buy_workers", "worker_name", "account_group", "feed_socket", "claims_file",
+])
+
+
+def get_bot_username():
+    value = os.getenv("BOT_TO_USE", "1")
+    try:
+        bot_index = int(value) - 1  # Converts to zero-based index
+        if bot_index < 0 or bot_index >= len(BOT_USERNAMES):
+            raise ValueError
+        return BOT_USERNAMES[bot_index]
+    except ValueError:
+        raise ValueError(
+            f"Invalid BOT_TO_USE value: {value}. Please set it to a number between 1 and {len(BOT_USERNAMES)} in your .env file."
+        ) from None
+
+
+def get_bot_usernames():
+    # BOTS_TO_USE takes a comma separated list of bot numbers (or "all"); falls back to BOT_TO_USE
+    bots_to_use = os.getenv("BOTS_TO_USE", "").strip().lower()
+    if not bots_to_use:
+        return [get_bot_username()]
+    if bots_to_use == "all":
+        return list(BOT_USERNAMES)
+
+    bot_usernames = []
+    for value in bots_to_use.split(","):
+        try:
+            bot_index = int(value) - 1
+            if bot_index < 0 or bot_index >= len(BOT_USERNAMES):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid BOTS_TO_USE value: {value.strip()}. Use numbers between 1 and {len(BOT_USERNAMES)} or 'all'.") from None
+        if BOT_USERNAMES[bot_index] not in bot_usernames:
+            bot_usernames.append(BOT_USERNAMES[bot_index])
+    return bot_usernames
+
+
+def read_number(name, default, kind, errors, minimum=None):
+    value = os.getenv(name, default)
+    try:
+        number = kind(value)
+    except ValueError:
+        errors.append(f"{name} must be {'a whole number' if kind is int else 'a number'}, got {value!r}")
+        return None
+    if minimum is not None and number < minimum:
+        errors.append(f"{name} must be at least {minimum}, got {number}")
+    return number
+
+
+def read_flag(name, default="False"):
+    return os.getenv(name, default).strip().lower() == "true"
+
+
+def load_settings():
+    # Every problem is collected and reported at once instead of failing on the first bad value
+    errors = []
+    access_token = os.getenv("ACCESS_TOKEN")
+    if not access_token:
+        errors.append("ACCESS_TOKEN is missing in your env file.")
+
+    try:
+        bot_usernames = tuple(get_bot_usernames())
+    except ValueError as e:
+        errors.append(str(e))
+        bot_usernames = ()
+
+    sol_amount = read_number("SOL_AMOUNT", "0.005", float, errors)
+    if sol_amount is not None and sol_amount <= 0:
+        errors.append("SOL_AMOUNT must be greater than 0.")
+
+    limit_order = None
+    if read_flag("SET_LIMIT_ORDER"):
+        percent = read_number("PERCENT_COINS_LIMIT_SELL", "100", int, errors, minimum=1)
+        multiple = read_number("MULTIPLE_CHANGE_LIMIT_SELL", "1", float, errors, minimum=0)
+        if percent is not None and percent > 100:
+            errors.append(f"PERCENT_COINS_LIMIT_SELL must be at most 100, got {percent}")
+        limit_order = (percent, multiple)
+
+    settings = Settings(
+        access_token=access_token,
+        whalewatch_url=os.getenv("WHALEWATCH_URL", "https://swap-api.assetdash.com/api/api_v5/whalewatch/transactions/list"),
+        api_id=os.getenv("TELEGRAM_API_ID"),
+        api_hash=os.getenv("TELEGRAM_API_HASH"),
+        sessions_dir=os.getenv("SESSIONS_DIR", "sessions"),
+        # Comma separated session names to use; empty means every session file in sessions_dir
+        sessions=tuple(name.strip() for name in os.getenv("SESSIONS", "").split(",") if name.strip()),
+        bot_usernames=bot_usernames,
+        whale_usd_amount=read_number("WHALE_USD_AMOUNT", "700", int, errors, minimum=0),
+        max_whale_coin_marketcap=read_number("MAX_WHALE_COIN_MARKETCAP", "200000", int, errors, minimum=0),
+        sol_amount=sol_amount,
+        limit_order=limit_order,
+        min_confluence_whales=read_number("MIN_CONFLUENCE_WHALES", "1", int, errors, minimum=1),
+        confluence_seconds=read_number("CONFLUENCE_SECONDS", "300", float, errors, minimum=0),
+        whale_names_blacklist=frozenset(
+            name.strip().upper() for name in os.getenv("WHALE_NAMES_BLACKLIST", "").split(",") if name.strip()
+        ),
+        save_bought_coins=read_flag("SAVE_BOUGHT_COINS"),
+        fetch_limit=read_number("FETCH_LIMIT", "20", int, errors, minimum=1),
+        max_catchup_pages=read_number("MAX_CATCHUP_PAGES", "5", int, errors, minimum=1),
+        max_catchup_seconds=read_number("MAX_CATCHUP_SECONDS", "300", int, errors, minimum=0),
+        cursor_file=os.getenv("CURSOR_FILE", "cursor.json"),
+        buy_workers=read_number("BUY_WORKERS", "0", int, errors, minimum=0),
+        # Set by the supervisor for its workers; CLAIMS_FILE also works for processes started by hand
+        worker_name=os.getenv("WORKER_NAME", "main"),
+        account_group=os.getenv("ACCOUNT_GROUP", "default"),
+        feed_socket=os.getenv("FEED_SOCKET") or None,
+        claims_file=os.getenv("CLAIMS_FILE") or None,
+    )
+    for kind, names in TUNING_KNOBS.items():
+        for name in names:
+            if os.getenv(name) is not None:
+                read_number(name, None, kind, errors)
+    if errors:
+        raise ValueError("Invalid configuration:\n  " + "\n  ".join(errors))
+    return settings
+
+
+settings = load_settings()
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import asyncio
+from prettytable import PrettyTable
+
+
+DASHBOARD_REFRESH = float(os.getenv("DASHBOARD_REFRESH", "1"))
+HEADLESS = os.getenv("HEADLESS", "False").strip().lower() == "true"
+CLEAR_SCREEN = "\033[H\033[2J\033[3J"
+
+
+def format_time_ago(seconds):
+    return f"{int(seconds // 60)}m ago" if seconds >= 60 else f"{int(seconds)}s ago"
+
+
+class Dashboard:
+    # Renders on its own task; the poller only bumps `version` when the tables' data changes
+    def __init__(self, recent_transactions, positions=None, refresh=DASHBOARD_REFRESH, status=()):
+        self.recent_transactions = recent_transactions
+        self.positions = positions
+        self.refresh = refresh
+        # Callables returning one-line status summaries shown under the tables
+        self.status = list(status)
+        self.version = 0
+        self.last_key = None
+
+        self.transaction_table = PrettyTable()
+        self.transaction_table.field_names = [
+            "Which Whale?", "Bought Coin", "Amount (USD)", "Market Cap (USD)", "Contract Address", "Time Ago"
+        ]
+        self.bought_table = PrettyTable()
+        self.bought_table.field_names = [
+            "Which Whale?", "Bought Coin", "Entry Market Cap", "Market Cap (USD)", "PnL", "Contract Address", "Dextools Link"
+        ]
+
+    def changed(self):
+        self.version += 1
+
+    def time_ago_column(self, now):
+        # Rows carry the epoch parsed once at decode time
+        return [format_time_ago(now - tx[5]) for tx in self.recent_transactions]
+
+    def render(self, time_ago, status):
+        self.transaction_table.clear_rows()
+        for tx, ago in zip(self.recent_transactions, time_ago):
+            whale_name, bought_coin, amount, market_cap, contract_address, _ = tx
+            self.transaction_table.add_row([whale_name, bought_coin, amount, market_cap, contract_address, ago])
+
+        self.bought_table.clear_rows()
+        for row in self.positions.rows() if self.positions is not None else []:
+            self.bought_table.add_row(row)
+
+        return (
+            f"{CLEAR_SCREEN}Recent Whale Transactions:\n{self.transaction_table}\n"
+            f"\nOpen Positions:\n{self.bought_table}\n"
+            f"{status}\n"
+        )
+
+    def draw(self):
+        time_ago = self.time_ago_column(time.time())
+        status = "".join(f"\n{line()}" for line in self.status)
+        # "Time Ago" only ticks once a second per row, so most refreshes change nothing on screen
+        key = (self.version, tuple(time_ago), status)
+        if key == self.last_key:
+            return
+        self.last_key = key
+        sys.stdout.write(self.render(time_ago, status))
+        sys.stdout.flush()
+
+    async def run(self):
+        if os.name == "nt":
+            os.system("")  # Enables ANSI escape handling in the Windows console
+        while True:
+            self.draw()
+            await asyncio.sleep(self.refresh)
@@ -0,0 +1,154 @@
+import os
+import time
+import asyncio
+from telegram_bot import buy_coin, sell_coin, create_client
+from rate_limiter import PRIORITY_READ
+
+
+SLOT_FAILURE_COOLDOWN = float(os.getenv("SLOT_FAILURE_COOLDOWN", "30"))
+LATENCY_SMOOTHING = float(os.getenv("LATENCY_SMOOTHING", "0.3"))
+
+
+class ExecutionSlot:
+    # One (session, bot) pair. Load is the number of buys routed to it that haven't finished yet.
+    def __init__(self, client, session_name, bot_username):
+        self.client = client
+        self.session_name = session_name
+        self.bot_username = bot_username
+        self.in_flight = 0
+        self.latency = None
+        self.cooldown_until = 0.0
+        self.completed = 0
+        self.failures = 0
+
+    def __str__(self):
+        return f"{self.session_name}/{self.bot_username}"
+
+    def available(self, now):
+        return now >= self.cooldown_until
+
+    def load_key(self):
+        # Unmeasured slots sort first so every pair gets sampled at least once
+        return self.in_flight, self.latency if self.latency is not None else 0.0
+
+    def record_latency(self, seconds):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def cool_down(self, seconds):
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+
+class ExecutionPool:
+    def __init__(self, session_names, bot_usernames, client_factory=create_client, limit_order=None):
+        self.session_names = session_names
+        self.bot_usernames = bot_usernames
+        self.client_factory = client_factory
+        self.limit_order = limit_order
+        self.clients = {}
+        self.slots = []
+
+    async def resolve_peer(self, session_name, client, bot_username):
+        # Caches the bot's peer in the session so the first CA send doesn't pay for the username lookup
+        try:
+            await client.gateway.call(bot_username, PRIORITY_READ, lambda: client.resolve_peer(bot_username))
+        except Exception as e:
+            print(f"Failed to resolve {bot_username} on {session_name}: {e}")
+
+    async def start_client(self, session_name):
+        client = self.client_factory(session_name)
+        try:
+            await client.start()
+            self.clients[session_name] = client
+        except Exception as e:
+            print(f"Failed to start session {session_name}: {e}")
+            return
+        await asyncio.gather(*(self.resolve_peer(session_name, client, bot_username) for bot_username in self.bot_usernames))
+
+    async def start(self):
+        started = time.perf_counter()
+        await asyncio.gather(*(self.start_client(session_name) for session_name in self.session_names))
+        if not self.clients:
+            raise ValueError("No Telegram session could be started")
+
+        self.slots = [
+            ExecutionSlot(client, session_name, bot_username)
+            for session_name, client in self.clients.items()
+            for bot_username in self.bot_usernames
+        ]
+        print(
+            f"Execution pool ready: {len(self.clients)} sessions x {len(self.bot_usernames)} bots = {len(self.slots)} slots "
+            f"in {time.perf_counter() - started:.2f}s."
+        )
+
+    async def stop(self):
+        for session_name, client in self.clients.items():
+            try:
+                await client.stop()
+            except Exception as e:
+                print(f"Error stopping session {session_name}: {e}")
+
+    def summary(self):
+        return "Telegram: " + "; ".join(client.gateway.summary() for client in self.clients.values())
+
+    def pick_slot(self, tried):
+        now = time.monotonic()
+        candidates = [slot for slot in self.slots if slot not in tried and slot.available(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=ExecutionSlot.load_key)
+
+    async def buy(self, contract_address, trace=None, sol_amount=None):
+        tried = []
+        while True:
+            slot = self.pick_slot(tried)
+            if slot is None:
+                print(f"No execution slot left to buy {contract_address} ({len(tried)} tried).")
+                return None
+            tried.append(slot)
+
+            slot.in_flight += 1
+            try:
+                result = await buy_coin(slot.client, contract_address, slot.bot_username, trace, sol_amount, self.limit_order)
+            finally:
+                slot.in_flight -= 1
+
+            # buy_coin returns None on invalid settings or any error, after which nobody knows how far the trade got
+            if result is None:
+                return None
+
+            if "send_ca" in result.step_timings:
+                slot.record_latency(result.step_timings["send_ca"])
+
+            if result.buy_sent:
+                slot.completed += 1
+                return result
+
+            slot.failures += 1
+            if result.amount_attempted:
+                # The amount may have reached the bot despite the error; another slot could buy the coin twice
+                print(f"Buy of {contract_address} on {slot} failed after the amount was sent, not failing over.")
+                return result
+            if result.flood_wait:
+                # FloodWait is imposed on the account, so every bot on that session has to wait it out
+                for other in self.slots:
+                    if other.client is slot.client:
+                        other.cool_down(result.flood_wait)
+            else:
+                slot.cool_down(SLOT_FAILURE_COOLDOWN)
+            print(f"Buy of {contract_address} failed on {slot}, failing over.")
+
+    async def sell(self, contract_address, session_name, bot_username, percent):
+        # The coins sit in the wallet behind that session and bot, so a sell can't fail over
+        slot = next((slot for slot in self.slots if slot.session_name == session_name and slot.bot_username == bot_username), None)
+        if slot is None:
+            print(f"Can't sell {contract_address}: {session_name}/{bot_username} is not in the execution pool.")
+            return None
+
+        slot.in_flight += 1
+        try:
+            return await sell_coin(slot.client, contract_address, bot_username, percent)
+        finally:
+            slot.in_flight -= 1
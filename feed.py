@@ -0,0 +1,131 @@
+import os
+import json
+import asyncio
+from transaction import Transaction, json_loads
+
+
+# asyncio has no Unix sockets on Windows, so the feed falls back to a loopback TCP port there
+USE_UNIX_SOCKET = os.name != "nt"
+FEED_PORT = int(os.getenv("FEED_PORT", "47800"))
+FEED_CONNECT_TIMEOUT = float(os.getenv("FEED_CONNECT_TIMEOUT", "10"))
+FEED_MAX_BUFFER = int(os.getenv("FEED_MAX_BUFFER", str(1024 * 1024)))
+
+
+def encode_transactions(transactions):
+    return b"".join(json.dumps(transaction.to_feed()).encode() + b"\n" for transaction in transactions)
+
+
+class FeedServer:
+    # Fans the supervisor's whalewatch feed out to every worker as JSON lines, one transaction per line
+    def __init__(self, address):
+        self.address = address
+        self.server = None
+        self.writers = set()
+        self.connected = asyncio.Event()
+        self.published = 0
+
+    async def start(self):
+        if USE_UNIX_SOCKET:
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # Left behind by a supervisor that didn't shut down cleanly
+            self.server = await asyncio.start_unix_server(self.on_connect, self.address)
+        else:
+            self.server = await asyncio.start_server(self.on_connect, "127.0.0.1", FEED_PORT)
+
+    async def close(self):
+        for writer in list(self.writers):
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if USE_UNIX_SOCKET and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    async def on_connect(self, reader, writer):
+        self.writers.add(writer)
+        self.connected.set()
+        try:
+            await reader.read()  # Workers never send anything; EOF means the worker went away
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def wait_for_workers(self, count, timeout):
+        while len(self.writers) < count:
+            self.connected.clear()
+            try:
+                await asyncio.wait_for(self.connected.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return len(self.writers)
+
+    def publish(self, transactions):
+        if not transactions:
+            return
+        data = encode_transactions(transactions)
+        self.published += len(transactions)
+        for writer in list(self.writers):
+            # A worker that stopped reading would grow this buffer forever; drop it and let it reconnect
+            if writer.transport.get_write_buffer_size() > FEED_MAX_BUFFER:
+                print("Dropping a worker that fell behind on the whale feed.")
+                self.writers.discard(writer)
+                writer.close()
+                continue
+            writer.write(data)
+
+
+class FeedClient:
+    # Stands in for WhalePoller inside a worker: poll() hands over whatever the supervisor pushed since the
+    # last call. The supervisor owns the cursor, so last_id and cutoff_time are ignored.
+    def __init__(self, address):
+        self.address = address
+        self.reader = None
+        self.writer = None
+        self.task = None
+        self.pending = []
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.received = 0
+
+    async def start(self):
+        if USE_UNIX_SOCKET:
+            connect = asyncio.open_unix_connection(self.address)
+        else:
+            connect = asyncio.open_connection("127.0.0.1", FEED_PORT)
+        self.reader, self.writer = await asyncio.wait_for(connect, FEED_CONNECT_TIMEOUT)
+        self.task = asyncio.create_task(self.read_feed())
+        print(f"Connected to the whale feed at {self.address if USE_UNIX_SOCKET else FEED_PORT}.")
+
+    async def read_feed(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                self.pending.append(Transaction(*json_loads(line)))
+                self.received += 1
+                self.ready.set()
+        finally:
+            self.closed = True
+            self.ready.set()
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.writer is not None:
+            self.writer.close()
+
+    async def poll(self, last_id, cutoff_time):
+        transactions, self.pending = self.pending, []
+        if not transactions and self.closed:
+            raise ConnectionError("The supervisor closed the whale feed")
+        return transactions
+
+    async def wait(self):
+        if not self.pending and not self.closed:
+            self.ready.clear()
+            await self.ready.wait()
+
+    def summary(self):
+        return f"Feed: {self.received} whale buys received from the supervisor"
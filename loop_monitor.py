@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import threading
+import traceback
+from collections import Counter, deque
+from aiohttp import web
+from tracing import Histogram, tracer, percentile
+
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+SLOW_CALLBACK_THRESHOLD = float(os.getenv("SLOW_CALLBACK_THRESHOLD", "0.25"))
+LOOP_REPORT_INTERVAL = float(os.getenv("LOOP_REPORT_INTERVAL", "60"))
+LOOP_STALL_FILE = os.getenv("LOOP_STALL_FILE", "loop_stalls.log")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".")
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Trace spans summarised next to the loop lag
+REPORT_STAGES = ("decision", "ca_sent", "buy_reply_sent", "end_to_end")
+
+
+def collapse_stack(frame):
+    # Root first, one "function (file:line)" per frame: the folded format flamegraph.pl and speedscope read
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    # Samples the event loop thread's stack from a side thread, so the loop itself is never instrumented
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.thread = None
+        self.running = False
+        self.started_at = None
+
+    def start(self):
+        self.samples = Counter()
+        self.running = True
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self.sample, name="loop-profiler", daemon=True)
+        self.thread.start()
+
+    def sample(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        filename = os.path.join(PROFILE_DIR, time.strftime("profile-%Y%m%d-%H%M%S.folded", time.localtime(self.started_at)))
+        with open(filename, "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+        return filename, sum(self.samples.values())
+
+
+class LoopMonitor:
+    # A task that oversleeps by the loop's lag on every tick, plus a watchdog thread that dumps the loop
+    # thread's stack to LOOP_STALL_FILE whenever that task hasn't ticked for SLOW_CALLBACK_THRESHOLD
+    def __init__(self, interval=LOOP_LAG_INTERVAL, threshold=SLOW_CALLBACK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=max(1, int(LOOP_REPORT_INTERVAL / interval)))
+        self.histogram = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.heartbeat = time.monotonic()
+        self.reported_heartbeat = None
+        self.last_report = time.monotonic()
+        self.thread_id = None
+        self.profiler = None
+        self.task = None
+        self.stopped = threading.Event()
+        self.watchdog_thread = None
+
+    async def start(self):
+        self.thread_id = threading.get_ident()
+        self.profiler = SamplingProfiler(self.thread_id)
+        self.heartbeat = time.monotonic()
+        self.task = asyncio.create_task(self.measure_lag())
+        self.watchdog_thread = threading.Thread(target=self.watchdog, name="loop-watchdog", daemon=True)
+        self.watchdog_thread.start()
+
+        tracer.collectors.append(self.metric_lines)
+        tracer.routes.append(("POST", "/profile", self.handle_profile))
+        if hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.toggle_profiler)
+
+    async def stop(self):
+        self.stopped.set()
+        if hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.profiler is not None and self.profiler.running:
+            self.toggle_profiler()
+
+    async def measure_lag(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.heartbeat = now
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            self.histogram.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if LOOP_REPORT_INTERVAL and now - self.last_report >= LOOP_REPORT_INTERVAL:
+                self.last_report = now
+                print(self.report())
+
+    def watchdog(self):
+        while not self.stopped.wait(self.threshold / 2):
+            heartbeat = self.heartbeat
+            blocked_for = time.monotonic() - heartbeat
+            # One capture per stall: the loop is stuck in the same callback until the heartbeat moves
+            if blocked_for < self.threshold or heartbeat == self.reported_heartbeat:
+                continue
+            self.reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stalls += 1
+            stack = "".join(traceback.format_stack(frame))
+            try:
+                with open(LOOP_STALL_FILE, "a") as file:
+                    file.write(f"--- {time.strftime('%Y-%m-%d %H:%M:%S')} loop blocked for {blocked_for:.3f}s+\n{stack}\n")
+            except OSError as e:
+                print(f"Error writing {LOOP_STALL_FILE}: {e}")
+            print(f"Event loop blocked for {blocked_for:.2f}s+, stack written to {LOOP_STALL_FILE}.")
+
+    def toggle_profiler(self):
+        if self.profiler.running:
+            filename, samples = self.profiler.stop()
+            message = f"Profiler stopped, {samples} samples written to {filename}."
+        else:
+            self.profiler.start()
+            message = f"Profiler started, sampling the event loop every {self.profiler.interval * 1000:.0f}ms."
+        print(message)
+        return message
+
+    async def handle_profile(self, request):
+        return web.Response(text=self.toggle_profiler() + "\n", content_type="text/plain")
+
+    def summary(self):
+        p50 = percentile(self.lags, 50)
+        if p50 is None:
+            return "Loop: no lag samples yet"
+        return (
+            f"Loop: lag p50 {p50 * 1000:.1f}ms p99 {percentile(self.lags, 99) * 1000:.1f}ms "
+            f"max {self.max_lag * 1000:.0f}ms, {self.stalls} stalls over {self.threshold * 1000:.0f}ms"
+        )
+
+    def report(self):
+        trades = []
+        for stage in REPORT_STAGES:
+            histogram = tracer.histograms.get(stage)
+            if histogram is not None and histogram.count:
+                trades.append(f"{stage} p50 <= {histogram.quantile(0.5)}s p95 <= {histogram.quantile(0.95)}s")
+        return f"{self.summary()} | Trades: {', '.join(trades) if trades else 'none traced yet'}"
+
+    def metric_lines(self):
+        lines = [
+            "# HELP whale_loop_lag_seconds How late the event loop woke a sleeping task.",
+            "# TYPE whale_loop_lag_seconds histogram",
+        ]
+        lines += self.histogram.metric_lines("whale_loop_lag_seconds")
+        lines.append(f"whale_loop_stalls_total {self.stalls}")
+        return lines
@@ -1,247 +1,236 @@
 import asyncio
-import aiohttp
-from prettytable import PrettyTable
-from datetime import datetime
-import os
-from telegram_bot import buy_coin, create_client, SessionManager, get_bot_username
-from dotenv import load_dotenv
-
-load_dotenv()
-
-ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
-WHALE_USD_AMOUNT = int(os.getenv("WHALE_USD_AMOUNT", "700"))
-MAX_WHALE_COIN_MARKETCAP = int(os.getenv("MAX_WHALE_COIN_MARKETCAP", "200000"))
-SAVE_BOUGHT_COINS = os.getenv("SAVE_BOUGHT_COINS", "False").strip().lower() == "true"
-WHALE_NAMES_BLACKLIST = set(
-    name.strip().upper() for name in os.getenv("WHALE_NAMES_BLACKLIST", "").split(",") if name.strip()
-)
-
-
-if not ACCESS_TOKEN:
-    raise ValueError("ACCESS_TOKEN is missing in your env file.")
-
-URL = "https://swap-api.assetdash.com/api/api_v5/whalewatch/transactions/list"
-HEADERS = {
-    "accept": "application/json, text/plain, */*",
-    "authorization": f"Bearer {ACCESS_TOKEN}",
-    "cache-control": "no-cache, no-store, must-revalidate",
-    "origin": "https://swap.assetdash.com",
-    "referer": "https://swap.assetdash.com/",
-    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
-}
-PARAMS = {"page": 1, "limit": 1, "transaction_types": "buy"}
-
-
-# Table setup
-transaction_table = PrettyTable()
-transaction_table.field_names = [
-    "Which Whale?", "Bought Coin", "Amount (USD)", "Market Cap (USD)", "Contract Address", "Time Ago"
-]
-
-bought_table = PrettyTable()
-bought_table.field_names = ["Which Whale?", "Bought Coin", "Market Cap (USD)", "Contract Address", "Dextools Link"]
-
-bought_coins_details = []
-recent_transactions = []
+import time
+from collections import deque
+from config import settings
+from telegram_bot import SessionManager
+from execution_pool import ExecutionPool
+from tracing import tracer
+from dashboard import Dashboard, HEADLESS
+from trade_journal import TradeJournal
+from poller import whalewatch_poller, starting_cursor, save_cursor
+from feed import FeedClient
+from claims import ContractClaims
+from loop_monitor import LoopMonitor
+from scheduler import BuyScheduler
+from rules import RuleEngine
+from activity_store import ActivityStore
+from positions import PositionTracker, create_price_source
+
+
+recent_transactions = deque(maxlen=10)
 last_transaction_id = None
 bought_coins = set()
-
-
-if SAVE_BOUGHT_COINS:
-    try:
-        with open("blacklist.txt", "r") as file:
-            bought_coins.update(line.strip() for line in file if line.strip())
-    except FileNotFoundError:
-        print("blacklist.txt file not found. Creating a new one...")
-        open("blacklist.txt", "w").close()
-    except Exception as e:
-        print(f"An error occurred while loading the blacklist: {e}")
-
-
-def save_blacklist(bought_coins, filename="blacklist.txt"):
+in_flight_coins = set()
+dashboard = Dashboard(recent_transactions)
+activity = ActivityStore()
+rules = RuleEngine({
+    "defaults": {
+        "min_amount": settings.whale_usd_amount,
+        "max_market_cap": settings.max_whale_coin_marketcap,
+        "sol_amount": settings.sol_amount,
+        "min_whales": settings.min_confluence_whales,
+        "confluence_seconds": settings.confluence_seconds,
+    },
+    "deny_whales": sorted(settings.whale_names_blacklist),
+}, activity=activity)
+
+
+journal = TradeJournal()
+# Shared with the other processes of the account group, so a coin is bought once per group
+claims = ContractClaims(settings.claims_file, settings.account_group, settings.worker_name) if settings.claims_file else None
+if claims is not None and claims.release_unconfirmed():
+    print("Released contract claims left in flight by a previous run.")
+if settings.save_bought_coins:
     try:
-        with open(filename, "w") as file:
-            for contract_address in bought_coins:
-                file.write(contract_address + "\n")
-        print(f"Updated blacklist saved to {filename}.")
+        journal.import_blacklist("blacklist.txt")
+        bought_coins.update(journal.load_contracts())
+        print(f"Loaded {len(bought_coins)} bought coins from the trade journal.")
     except Exception as e:
-        print(f"Error saving blacklist: {e}")
-
-
-async def fetch_transaction(session):
-    try:
-        async with session.get(URL, headers=HEADERS, params=PARAMS, timeout=2) as response:
-            response.raise_for_status()
-            data = await response.json()
-            if "transactions" in data and data["transactions"]:
-                return data["transactions"][0]
-    except asyncio.TimeoutError:
-        print("Request timed out while fetching whale buys info. Retrying...")
-    except aiohttp.ClientError as e:
-        print(f"Error while fetching whale buys info: {e}")
-    return None
+        print(f"An error occurred while loading the trade journal: {e}")
 
 
 def format_transaction(transaction):
-    try:
-        whale_name = transaction["swap_whalewatch_list"]["name"]
-        bought_coin = transaction["swap_token"]["symbol"]
-        amount = transaction.get("trade_amount_rounded")
-        amount = round(amount, 2) if amount is not None else 0.0
-        market_cap = transaction.get("token_market_cap", "Unknown")
-        if market_cap != "Unknown" and market_cap is not None:
-            market_cap = round(market_cap, 2)
-        else:
-            market_cap = "Unknown"    
-        contract_address = transaction["swap_token"]["token_address"]
-
-        return (
-            whale_name,
-            bought_coin,
-            f"${amount:,.2f}",
-            f"${market_cap:,.2f}" if market_cap != "Unknown" else market_cap,
-            contract_address,
-            transaction["timestamp"],
-        )
-    except KeyError as e:
-        print(f"Missing key in transaction data: {e}")
-    return None
+    return (
+        transaction.whale_name,
+        transaction.symbol,
+        transaction.display_amount,
+        transaction.display_market_cap,
+        transaction.contract_address,
+        transaction.epoch,
+    )
 
 
 def update_table(transaction):
-    global recent_transactions
-    formatted_transaction = format_transaction(transaction)
-    if formatted_transaction and formatted_transaction not in recent_transactions:
-        recent_transactions.insert(0, formatted_transaction)
-        if len(recent_transactions) > 10:
-            recent_transactions.pop()
-
-
-def add_bought_coin_details(transaction):
-    try:
-        bought_coin = transaction["swap_token"]["symbol"]
-        whale_name = transaction["swap_whalewatch_list"]["name"]
-        market_cap = transaction.get("token_market_cap", "Unknown")
-        if market_cap != "Unknown" and market_cap is not None:
-            market_cap = round(market_cap, 2)
-        else:
-            market_cap = "Unknown"    
-        contract_address = transaction["swap_token"]["token_address"]
-        dextools_link = f"https://dextools.io/app/en/solana/pair-explorer/{contract_address}"
-
-        bought_coins_details.insert(0, [
-            whale_name,
-            bought_coin,
-            f"${market_cap:,.2f}" if market_cap != "Unknown" else market_cap,
-            contract_address,
-            dextools_link,
-        ])
-
-        if len(bought_coins_details) > 5:
-            bought_coins_details.pop()
-    except KeyError as e:
-        print(f"Error adding bought coin details: Missing key {e}")
-
-
-async def check_and_buy_coin(transaction, bought_coins, client):
-    try:
-        bot_username = get_bot_username()
+    recent_transactions.appendleft(format_transaction(transaction))
+    dashboard.changed()
 
-        amount = transaction.get("trade_amount_rounded")
-        if amount is None:
-            print("Error: trade_amount_rounded is missing or None.")
-            return
 
-        market_cap = transaction.get("token_market_cap")
-        if market_cap is None:
-            print("Error: token_market_cap is missing or None.")
-            return
+def claim_coin(contract_address, bought_coins):
+    # Check and claim with no await in between so two workers can never buy the same coin
+    if contract_address in bought_coins or contract_address in in_flight_coins:
+        return False
+    # The shared claim comes last; it is released again if the buy fails or goes stale
+    if claims is not None and not claims.claim(contract_address):
+        return False
+    in_flight_coins.add(contract_address)
+    return True
 
-        contract_address = transaction["swap_token"]["token_address"]
 
-        if amount >= WHALE_USD_AMOUNT and market_cap <= MAX_WHALE_COIN_MARKETCAP:
-            if contract_address not in bought_coins:
-                print(f"Criteria met! Buying coin with contract address: {contract_address}")
-                await buy_coin(client, contract_address, bot_username)
-                bought_coins.add(contract_address)
-                add_bought_coin_details(transaction)
-            else:
-                print(f"Coin with contract address {contract_address} already bought. Skipping.")
-    except KeyError as e:
-        print(f"Missing key in transaction data: {e}")
-    except Exception as e:
-        print(f"Unexpected error in check_and_buy_coin function: {e}")
+def release_coin(contract_address):
+    in_flight_coins.discard(contract_address)
+    if claims is not None:
+        claims.release(contract_address)
 
-async def main():
-    global last_transaction_id
 
-    start_time = datetime.utcnow()
+async def check_and_buy_coin(transaction, bought_coins, scheduler, trace=None):
+    if transaction.amount is None:
+        print("Error: trade_amount_rounded is missing or None.")
+        return False
 
-    session_name = SessionManager().get_first_session()
-    async with create_client(session_name) as telegram_client:
-        print("Telegram client initialized successfully.")
+    if transaction.market_cap is None:
+        print("Error: token_market_cap is missing or None.")
+        return False
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                while True:
-                    latest_transaction = await fetch_transaction(session)
-                    if latest_transaction:
-                        transaction_id = latest_transaction.get("id")
-                        transaction_timestamp = latest_transaction.get("timestamp")
-
-                        try:
-                            transaction_time = datetime.strptime(transaction_timestamp, "%Y-%m-%dT%H:%M:%S")
-                        except Exception as e:
-                            print(f"Error parsing transaction timestamp: {e}")
-                            continue
-                        
-                        update_table(latest_transaction)
-
-                        if transaction_id and transaction_id != last_transaction_id:
-                            last_transaction_id = transaction_id
-
-                            if transaction_time < start_time:
-                                print(f"Transaction skipped: Timestamp {transaction_time} is earlier than script start time {start_time}.")
-                                continue
-
-                            whale_name = latest_transaction["swap_whalewatch_list"]["name"].upper().strip()
-                            if whale_name in WHALE_NAMES_BLACKLIST:
-                                print(f"Transaction skipped: Whale '{whale_name}' is in the blacklist.")
-                                continue
-
-                            await check_and_buy_coin(latest_transaction, bought_coins, telegram_client)
-
-                    transaction_table.clear_rows()
-                    for tx in recent_transactions:
-                        whale_name, bought_coin, amount, market_cap, contract_address, timestamp = tx
-                        try:
-                            transaction_time = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
-                            time_ago_seconds = (datetime.utcnow() - transaction_time).total_seconds()
-                            time_ago = f"{int(time_ago_seconds // 60)}m ago" if time_ago_seconds >= 60 else f"{int(time_ago_seconds)}s ago"
-
-                            transaction_table.add_row([
-                                whale_name, bought_coin, amount, market_cap, contract_address, time_ago
-                            ])
-                        except Exception as e:
-                            print(f"Error processing timestamp: {e}")
-
-                    bought_table.clear_rows()
-                    for detail in bought_coins_details:
-                        bought_table.add_row(detail)
-
-                    os.system("cls" if os.name == "nt" else "clear")
-                    print("Recent Whale Transactions:")
-                    print(transaction_table)
-                    print("\nBought Coins Details: You better Monitor it on BonkBot")
-                    print(bought_table)
+    # A rule or claim store error (e.g. a locked claims file) skips this buy rather than ending the poll loop
+    try:
+        sol_amount = rules.evaluate(transaction)
+        if sol_amount is None:
+            return False
+
+        contract_address = transaction.contract_address
+        if claim_coin(contract_address, bought_coins):
+            print(f"Criteria met! Queueing {sol_amount} SOL buy for contract address: {contract_address}")
+            if trace is not None:
+                trace.mark("decision")
+            # From here on the scheduler owns the claim and the trace, even if it drops the order as stale
+            scheduler.put(transaction, trace, sol_amount)
+            return True
+        print(f"Coin with contract address {contract_address} already bought or being bought. Skipping.")
+    except Exception as e:
+        print(f"Unexpected error in check_and_buy_coin function: {e}")
+    return False
+
+
+def release_expired_order(order):
+    release_coin(order.transaction.contract_address)
+    if order.trace is not None:
+        tracer.finish(order.trace, "expired")
+
+
+async def buy_worker(scheduler, pool, positions):
+    while True:
+        order = await scheduler.get()
+        transaction, trace, sol_amount = order.transaction, order.trace, order.sol_amount
+        contract_address = transaction.contract_address
+        outcome = "failed"
+        try:
+            print(f"Buying coin with contract address: {contract_address}")
+            result = await pool.buy(contract_address, trace, sol_amount)
+            if result is not None and result.buy_sent:
+                outcome = "bought"
+                bought_coins.add(contract_address)
+                if claims is not None:
+                    claims.confirm(contract_address)
+                journal.record_buy(transaction, result)
+                positions.open(transaction, result)
+            elif result is not None and result.amount_attempted:
+                # The amount may have gone through, so the coin is never bought again; there's no fill to journal
+                outcome = "unconfirmed"
+                bought_coins.add(contract_address)
+                if claims is not None:
+                    claims.confirm(contract_address)
+        except Exception as e:
+            print(f"Unexpected error in buy_worker: {e}")
+        finally:
+            if trace is not None:
+                tracer.finish(trace, outcome)
+            # A buy that never got its amount sent is released so a later whale buy can retry it
+            if outcome != "failed":
+                in_flight_coins.discard(contract_address)
+            else:
+                release_coin(contract_address)
 
-                    await asyncio.sleep(1)
 
-            except asyncio.CancelledError:
-                print("Program interrupted.")
-            except Exception as e:
-                print(f"Unexpected error: {e}")
+async def main(pool=None, url=settings.whalewatch_url):
+    global last_transaction_id
 
+    last_transaction_id, cutoff_time = starting_cursor()
+
+    if pool is None:
+        pool = ExecutionPool(SessionManager().parse_sessions(), settings.bot_usernames, limit_order=settings.limit_order)
+    # Under the supervisor the whale buys come from its feed, and the supervisor keeps the cursor
+    poller = FeedClient(settings.feed_socket) if settings.feed_socket else whalewatch_poller(url)
+    positions = PositionTracker(journal, create_price_source(), pool.sell, on_change=dashboard.changed)
+    dashboard.positions = positions
+    # Started first so startup itself is measured; its /profile route must exist before the metrics server starts
+    monitor = LoopMonitor()
+    await monitor.start()
+    tasks = []
+    try:
+        # Telegram logins (each resolving its bots' peers), the whalewatch warm-up, the price source and the
+        # metrics server don't depend on each other
+        startup_started = time.perf_counter()
+        results = await asyncio.gather(
+            pool.start(), poller.start(), positions.start(), tracer.start_server(), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        print(f"Telegram clients initialized successfully. Startup took {time.perf_counter() - startup_started:.2f}s.")
+
+        # One worker per (session, bot) slot unless BUY_WORKERS says otherwise
+        scheduler = BuyScheduler(release_expired_order)
+        tasks = [asyncio.create_task(buy_worker(scheduler, pool, positions)) for _ in range(settings.buy_workers or len(pool.slots))]
+        tasks.append(asyncio.create_task(rules.watch()))
+        tasks.append(asyncio.create_task(positions.run()))
+        if not HEADLESS:
+            tasks.append(asyncio.create_task(dashboard.run()))
+        dashboard.status = [poller.summary, scheduler.summary, positions.summary, pool.summary, monitor.summary]
+
+        try:
+            while True:
+                new_transactions = await poller.poll(last_transaction_id, cutoff_time)
+                fetched_at = time.time()
+                for transaction in new_transactions:
+                    trace = tracer.start(transaction.id, transaction.contract_address, transaction.epoch)
+                    trace.mark("fetch_received", fetched_at)
+
+                    # The activity store dedupes by id and must see the buy before the confluence check
+                    if not activity.add(transaction):
+                        trace.mark("decision")
+                        tracer.finish(trace, "duplicate")
+                        continue
+                    update_table(transaction)
+
+                    queued = await check_and_buy_coin(transaction, bought_coins, scheduler, trace)
+
+                    if not queued:
+                        trace.mark("decision")
+                        tracer.finish(trace, "skipped")
+
+                # One checkpoint per batch, after every buy in it is queued: save_cursor fsyncs
+                if not settings.feed_socket:
+                    for transaction in reversed(new_transactions):
+                        if transaction.id:
+                            last_transaction_id, cutoff_time = transaction.id, transaction.epoch
+                            save_cursor(last_transaction_id, transaction.timestamp)
+                            break
+
+                await poller.wait()
+
+        except asyncio.CancelledError:
+            print("Program interrupted.")
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await poller.close()
+        await positions.close()
+        await tracer.stop_server()
+        await pool.stop()
+        await monitor.stop()
 
 
 if __name__ == "__main__":
@@ -250,7 +239,8 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("Bot stopped by User")
     finally:
-        if SAVE_BOUGHT_COINS:
-            save_blacklist(bought_coins)
-        else:
-            print("SAVE_BOUGHT_COINS is not Enabled in your env. Changes to bought coins were not saved to the blacklist.")    
\ No newline at end of file
+        journal.close()
+        if claims is not None:
+            claims.close()
+        if not settings.save_bought_coins:
+            print("SAVE_BOUGHT_COINS is not Enabled in your env. Bought coins are journaled but won't be skipped on the next run.")    
\ No newline at end of file
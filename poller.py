@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+import aiohttp
+from config import settings
+from tracing import percentile
+from transaction import decode_transactions, parse_epoch
+from recorder import create_recorder
+
+
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "1"))
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "0.25"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "10"))
+POLL_TIMEOUT = float(os.getenv("POLL_TIMEOUT", "2"))
+POLL_CONNECTIONS = int(os.getenv("POLL_CONNECTIONS", "4"))
+POLL_REPORT_INTERVAL = float(os.getenv("POLL_REPORT_INTERVAL", "60"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "authorization": f"Bearer {settings.access_token}",
+    "cache-control": "no-cache, no-store, must-revalidate",
+    "origin": "https://swap.assetdash.com",
+    "referer": "https://swap.assetdash.com/",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+}
+PARAMS = {"page": 1, "limit": settings.fetch_limit, "transaction_types": "buy"}
+
+
+def load_cursor(filename=settings.cursor_file):
+    try:
+        with open(filename, "r") as file:
+            cursor = json.load(file)
+        last_id = cursor.get("last_transaction_id")
+        last_timestamp = cursor["last_transaction_timestamp"]
+        print(f"Resuming from transaction {last_id} at {last_timestamp}.")
+        return last_id, parse_epoch(last_timestamp)
+    except FileNotFoundError:
+        return None, None
+    except Exception as e:
+        print(f"Error loading cursor from {filename}: {e}")
+        return None, None
+
+
+def save_cursor(last_id, last_timestamp, filename=settings.cursor_file):
+    # Write to a temp file first so a crash mid-write never leaves a corrupt cursor behind
+    temp_filename = f"{filename}.tmp"
+    try:
+        with open(temp_filename, "w") as file:
+            json.dump({"last_transaction_id": last_id, "last_transaction_timestamp": last_timestamp}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, filename)
+    except Exception as e:
+        print(f"Error saving cursor to {filename}: {e}")
+
+
+def starting_cursor():
+    # API timestamps have whole-second resolution, so buys from the starting second must not be cut off
+    start_time = int(time.time())
+    last_id, cutoff_time = load_cursor()
+    catchup_limit = start_time - settings.max_catchup_seconds
+    if cutoff_time is None:
+        cutoff_time = start_time
+    elif cutoff_time < catchup_limit:
+        print(f"Cursor is older than MAX_CATCHUP_SECONDS. Catching up from the last {settings.max_catchup_seconds} seconds instead.")
+        cutoff_time = catchup_limit
+    return last_id, cutoff_time
+
+
+class Throttled(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failures; once `cooldown` has passed a single trial request
+    # is let through (half-open) and its outcome closes or re-opens the breaker
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.remaining() == 0 else "open"
+
+    def remaining(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def allow(self):
+        return self.remaining() == 0
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                print(f"Whalewatch circuit breaker opened after {self.failures} consecutive failures.")
+            self.opened_at = time.monotonic()
+
+
+class WhalePoller:
+    def __init__(self, url, headers, params, page_size, max_pages, recorder=None):
+        self.url = url
+        self.headers = headers
+        self.params = params
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.session = None
+        self.recorder = recorder
+        self.raw = None
+        self.breaker = CircuitBreaker()
+        self.interval = POLL_INTERVAL
+        self.latencies = deque(maxlen=200)
+        self.detection_delays = deque(maxlen=500)
+        self.requests = 0
+        self.hedged = 0
+        self.throttled = 0
+        self.last_report = time.monotonic()
+
+    async def start(self):
+        # Keep-alive pool with cached DNS so polls skip the TCP/TLS handshake and the resolver
+        connector = aiohttp.TCPConnector(limit=POLL_CONNECTIONS, ttl_dns_cache=300, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector, headers=self.headers, timeout=aiohttp.ClientTimeout(total=POLL_TIMEOUT)
+        )
+        await self.warm_up()
+
+    async def warm_up(self):
+        # Open the pooled connections before the first real poll needs them
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.request_page(1) for _ in range(min(2, POLL_CONNECTIONS))), return_exceptions=True
+        )
+        warmed = sum(1 for result in results if not isinstance(result, BaseException))
+        print(f"Warmed {warmed} whalewatch connections in {time.perf_counter() - started:.2f}s.")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    async def request_page(self, page):
+        self.requests += 1
+        async with self.session.get(self.url, params={**self.params, "page": page}) as response:
+            if response.status == 429 or response.status >= 500:
+                retry_after = response.headers.get("Retry-After")
+                raise Throttled(response.status, float(retry_after) if retry_after and retry_after.isdigit() else None)
+            response.raise_for_status()
+            return decode_transactions(await response.read(), self.raw)
+
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(self.latencies, HEDGE_PERCENTILE)
+
+    async def hedged_request(self, page):
+        # A request slower than the usual HEDGE_PERCENTILE latency gets a duplicate; the first good answer wins
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(self.request_page(page))]
+        try:
+            hedge_after = self.hedge_delay()
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self.hedged += 1
+                    tasks.append(asyncio.create_task(self.request_page(page)))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.append(time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def fetch_page(self, page):
+        if not self.breaker.allow():
+            return None
+        try:
+            transactions = await self.hedged_request(page)
+            self.breaker.record_success()
+            return transactions
+        except Throttled as e:
+            self.throttled += 1
+            self.back_off(e.retry_after)
+            print(f"Whalewatch answered {e.status}. Backing off to {self.interval:.2f}s between polls.")
+        except asyncio.TimeoutError:
+            self.back_off()
+            print("Request timed out while fetching whale buys info. Retrying...")
+        except aiohttp.ClientError as e:
+            self.back_off()
+            print(f"Error while fetching whale buys info: {e}")
+        except ValueError as e:
+            print(f"Invalid JSON while fetching whale buys info: {e}")
+        self.breaker.record_failure()
+        return None
+
+    def back_off(self, retry_after=None):
+        self.interval = min(POLL_MAX_INTERVAL, max(self.interval * 2, retry_after or 0))
+
+    def adapt(self, new_count):
+        # Tighten while whales are active, drift back to POLL_INTERVAL when quiet or after a backoff
+        if new_count:
+            self.interval = max(POLL_MIN_INTERVAL, self.interval / 2)
+        elif self.interval < POLL_INTERVAL:
+            self.interval = min(POLL_INTERVAL, self.interval * 1.5)
+        elif self.interval > POLL_INTERVAL:
+            self.interval = max(POLL_INTERVAL, self.interval / 2)
+
+    async def poll(self, last_id, cutoff_time):
+        # Pages come newest first; walk back until the last processed id (or the cutoff) is reached
+        new_transactions = []
+        seen_ids = set()
+        self.raw = {} if self.recorder is not None else None
+        for page in range(1, self.max_pages + 1):
+            transactions = await self.fetch_page(page)
+            if transactions is None:
+                # Handing back only the newer pages would move the cursor past the ones that failed;
+                # returning nothing makes the next poll walk the same pages again
+                return []
+            if not transactions:
+                break
+
+            for transaction in transactions:
+                if (last_id is not None and transaction.id == last_id) or transaction.epoch < cutoff_time:
+                    return self.received(new_transactions[::-1])
+
+                # New buys landing between page requests shift older ones onto the next page
+                if transaction.id in seen_ids:
+                    continue
+                seen_ids.add(transaction.id)
+                new_transactions.append(transaction)
+
+            if len(transactions) < self.page_size:
+                break
+        else:
+            print(f"Caught up {len(new_transactions)} transactions but hit MAX_CATCHUP_PAGES ({self.max_pages}). Older buys may have been missed.")
+
+        return self.received(new_transactions[::-1])
+
+    def received(self, transactions):
+        # API timestamps have whole-second resolution, so these delays include up to 1s of rounding
+        now = time.time()
+        for transaction in transactions:
+            self.detection_delays.append(now - transaction.epoch)
+        if self.recorder is not None:
+            self.recorder.write([self.raw[transaction] for transaction in transactions if transaction in self.raw])
+        self.adapt(len(transactions))
+        self.report()
+        return transactions
+
+    async def wait(self):
+        await asyncio.sleep(max(self.interval, self.breaker.remaining()))
+
+    def summary(self):
+        p50 = percentile(self.detection_delays, 50)
+        p95 = percentile(self.detection_delays, 95)
+        detection = f"p50 {p50:.2f}s p95 {p95:.2f}s" if p50 is not None else "no buys yet"
+        return (
+            f"Poller: interval {self.interval:.2f}s, detection delay {detection}, {self.requests} requests, "
+            f"{self.hedged} hedged, {self.throttled} throttled, breaker {self.breaker.state}"
+        )
+
+    def report(self):
+        if POLL_REPORT_INTERVAL and time.monotonic() - self.last_report >= POLL_REPORT_INTERVAL:
+            self.last_report = time.monotonic()
+            print(self.summary())
+
+
+def whalewatch_poller(url=settings.whalewatch_url):
+    return WhalePoller(url, HEADERS, PARAMS, settings.fetch_limit, settings.max_catchup_pages, create_recorder())
@@ -0,0 +1,265 @@
+import os
+import time
+import asyncio
+import aiohttp
+from transaction import json_loads
+
+
+PRICE_SOURCE = os.getenv("PRICE_SOURCE", "dexscreener").strip().lower()
+PRICE_SOURCE_URL = os.getenv("PRICE_SOURCE_URL", "https://api.dexscreener.com/latest/dex/tokens/")
+PRICE_FILE = os.getenv("PRICE_FILE", "prices.json")
+PRICE_TIMEOUT = float(os.getenv("PRICE_TIMEOUT", "5"))
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "30"))
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "5"))
+POSITION_REFRESH_INTERVAL = float(os.getenv("POSITION_REFRESH_INTERVAL", "10"))
+# Multiples of the entry market cap; 0 disables the level
+TAKE_PROFIT_MULTIPLE = float(os.getenv("TAKE_PROFIT_MULTIPLE", "0"))
+STOP_LOSS_MULTIPLE = float(os.getenv("STOP_LOSS_MULTIPLE", "0"))
+SELL_PERCENT = int(os.getenv("SELL_PERCENT", "100"))
+
+
+class DexScreenerSource:
+    # One GET returns every pair of up to 30 comma separated token addresses
+    def __init__(self, url=PRICE_SOURCE_URL):
+        self.url = url
+        self.session = None
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=PRICE_TIMEOUT))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch(self, contract_addresses):
+        async with self.session.get(self.url + ",".join(contract_addresses)) as response:
+            response.raise_for_status()
+            pairs = json_loads(await response.read()).get("pairs") or []
+
+        # A token trades in several pools; the deepest one sets the price
+        wanted = set(contract_addresses)
+        best = {}
+        for pair in pairs:
+            contract_address = pair.get("baseToken", {}).get("address")
+            market_cap = pair.get("marketCap") or pair.get("fdv")
+            if contract_address not in wanted or not market_cap:
+                continue
+            liquidity = (pair.get("liquidity") or {}).get("usd") or 0
+            if contract_address not in best or liquidity > best[contract_address][0]:
+                best[contract_address] = (liquidity, float(market_cap))
+        return {contract_address: market_cap for contract_address, (_, market_cap) in best.items()}
+
+
+class StaticPriceSource:
+    # Local stub: market caps come from a dict or a JSON file of {contract_address: market_cap} that is
+    # re-read on every fetch, so prices can be moved by hand to exercise take-profit and stop-loss
+    def __init__(self, market_caps=None, filename=None):
+        self.market_caps = dict(market_caps or {})
+        self.filename = filename
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, contract_addresses):
+        if self.filename is not None:
+            try:
+                with open(self.filename, "rb") as file:
+                    self.market_caps = json_loads(file.read())
+            except FileNotFoundError:
+                pass
+        return {
+            contract_address: float(self.market_caps[contract_address])
+            for contract_address in contract_addresses if contract_address in self.market_caps
+        }
+
+
+def create_price_source(name=PRICE_SOURCE):
+    if name == "dexscreener":
+        return DexScreenerSource()
+    if name == "file":
+        return StaticPriceSource(filename=PRICE_FILE)
+    if name == "off":
+        return None
+    raise ValueError(f"Invalid PRICE_SOURCE value: {name}. Use dexscreener, file or off.")
+
+
+class Position:
+    __slots__ = (
+        "contract_address", "opened_at", "symbol", "whale_name", "entry_market_cap", "sol_amount",
+        "session_name", "bot_username", "market_cap", "selling",
+    )
+
+    def __init__(self, contract_address, opened_at, symbol, whale_name, entry_market_cap, sol_amount, session_name, bot_username):
+        self.contract_address = contract_address
+        self.opened_at = opened_at
+        self.symbol = symbol
+        self.whale_name = whale_name
+        self.entry_market_cap = entry_market_cap
+        self.sol_amount = sol_amount
+        self.session_name = session_name
+        self.bot_username = bot_username
+        self.market_cap = None
+        self.selling = False
+
+    @property
+    def multiple(self):
+        if self.market_cap is None or not self.entry_market_cap:
+            return None
+        return self.market_cap / self.entry_market_cap
+
+    @property
+    def unrealized_pnl(self):
+        # In SOL, before fees and slippage
+        multiple = self.multiple
+        return self.sol_amount * (multiple - 1) if multiple is not None else 0.0
+
+
+class PositionTracker:
+    # Open positions live in the journal; every refresh prices all of them in batches of PRICE_BATCH_SIZE,
+    # reusing quotes younger than PRICE_CACHE_TTL, and sells any position that crossed a level.
+    # A sell closes the position here whatever SELL_PERCENT is; what's left is yours to manage on BonkBot.
+    def __init__(self, journal, source, sell, take_profit=TAKE_PROFIT_MULTIPLE, stop_loss=STOP_LOSS_MULTIPLE,
+                 sell_percent=SELL_PERCENT, on_change=None):
+        self.journal = journal
+        self.source = source
+        self.sell = sell
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+        self.sell_percent = sell_percent
+        self.on_change = on_change
+        self.cache = {}
+        self.tasks = set()
+        self.sold = 0
+        self.positions = {row[0]: Position(*row) for row in journal.open_positions()}
+
+    def __len__(self):
+        return len(self.positions)
+
+    async def start(self):
+        if self.source is not None:
+            await self.source.start()
+        if self.positions:
+            print(f"Tracking {len(self.positions)} open positions from the trade journal.")
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.source is not None:
+            await self.source.close()
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def open(self, transaction, result):
+        opened_at = self.journal.open_position(transaction, result)
+        self.positions[transaction.contract_address] = Position(
+            transaction.contract_address, opened_at, transaction.symbol, transaction.whale_name, transaction.market_cap,
+            result.sol_amount, getattr(result.client, "name", None), result.bot_username,
+        )
+        self.changed()
+
+    async def market_caps(self, contract_addresses):
+        now = time.monotonic()
+        market_caps = {}
+        stale = []
+        for contract_address in contract_addresses:
+            cached = self.cache.get(contract_address)
+            if cached is not None and now - cached[0] < PRICE_CACHE_TTL:
+                market_caps[contract_address] = cached[1]
+            else:
+                stale.append(contract_address)
+
+        batches = [stale[index:index + PRICE_BATCH_SIZE] for index in range(0, len(stale), PRICE_BATCH_SIZE)]
+        results = await asyncio.gather(*(self.source.fetch(batch) for batch in batches), return_exceptions=True)
+        fetched_at = time.monotonic()
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error fetching market caps: {result}")
+                continue
+            for contract_address, market_cap in result.items():
+                self.cache[contract_address] = (fetched_at, market_cap)
+                market_caps[contract_address] = market_cap
+        return market_caps
+
+    def exit_reason(self, position):
+        multiple = position.multiple
+        if multiple is None:
+            return None
+        if self.take_profit and multiple >= self.take_profit:
+            return "take_profit"
+        if self.stop_loss and multiple <= self.stop_loss:
+            return "stop_loss"
+        return None
+
+    async def refresh(self):
+        if self.source is None or not self.positions:
+            return
+        market_caps = await self.market_caps(list(self.positions))
+        for contract_address, market_cap in market_caps.items():
+            position = self.positions.get(contract_address)
+            if position is None:
+                continue
+            position.market_cap = market_cap
+            reason = self.exit_reason(position)
+            if reason and not position.selling:
+                position.selling = True
+                task = asyncio.create_task(self.close_position(position, reason))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        self.cache = {key: value for key, value in self.cache.items() if key in self.positions}
+        self.changed()
+
+    async def close_position(self, position, reason):
+        print(f"{reason.replace('_', ' ').capitalize()} hit for {position.symbol} ({position.contract_address}) "
+              f"at {position.multiple:.2f}x. Selling {self.sell_percent}%.")
+        try:
+            result = await self.sell(position.contract_address, position.session_name, position.bot_username, self.sell_percent)
+            if result is None or not result.sold:
+                print(f"Sell of {position.contract_address} failed, retrying on the next refresh.")
+                return
+            self.journal.close_position(position.contract_address, position.market_cap, reason, self.sell_percent)
+            self.positions.pop(position.contract_address, None)
+            self.sold += 1
+            self.changed()
+        finally:
+            position.selling = False
+
+    async def run(self, interval=POSITION_REFRESH_INTERVAL):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing positions: {e}")
+            await asyncio.sleep(interval)
+
+    def rows(self, limit=5):
+        rows = []
+        for position in sorted(self.positions.values(), key=lambda position: position.opened_at, reverse=True)[:limit]:
+            multiple = position.multiple
+            rows.append([
+                position.whale_name,
+                position.symbol,
+                f"${position.entry_market_cap:,.2f}",
+                f"${position.market_cap:,.2f}" if position.market_cap is not None else "Unknown",
+                f"{multiple:.2f}x ({position.unrealized_pnl:+.4f} SOL)" if multiple is not None else "-",
+                position.contract_address,
+                f"https://dextools.io/app/en/solana/pair-explorer/{position.contract_address}",
+            ])
+        return rows
+
+    def summary(self):
+        pnl = sum(position.unrealized_pnl for position in self.positions.values())
+        levels = []
+        if self.take_profit:
+            levels.append(f"take profit {self.take_profit:g}x")
+        if self.stop_loss:
+            levels.append(f"stop loss {self.stop_loss:g}x")
+        return (
+            f"Positions: {len(self.positions)} open, unrealized {pnl:+.4f} SOL, {self.sold} sold"
+            + (f" ({', '.join(levels)})" if levels else "")
+        )
@@ -0,0 +1,112 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from pyrogram.errors import FloodWait
+from tracing import Histogram, tracer
+
+
+SESSION_RATE = float(os.getenv("SESSION_RATE", "5"))
+SESSION_BURST = float(os.getenv("SESSION_BURST", "10"))
+BOT_RATE = float(os.getenv("BOT_RATE", "2"))
+BOT_BURST = float(os.getenv("BOT_BURST", "5"))
+FLOOD_RETRY_LIMIT = float(os.getenv("FLOOD_RETRY_LIMIT", "5"))
+
+# Lower runs first: the buy itself, then limit orders and sells, then reads such as history or peers
+PRIORITY_BUY = 0
+PRIORITY_ORDER = 1
+PRIORITY_READ = 2
+
+
+class TokenBucket:
+    # Waiters are served strictly by (priority, arrival); only the head of the line may take a token
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.wakeup = asyncio.Event()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.wakeup.set()
+
+    async def acquire(self, priority):
+        entry = [priority, next(self.sequence)]
+        heapq.heappush(self.waiters, entry)
+        try:
+            while True:
+                now = time.monotonic()
+                self.refill(now)
+                timeout = None
+                if self.waiters[0] is entry:
+                    timeout = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+                    if timeout <= 0:
+                        self.tokens -= 1
+                        return
+
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+            self.wakeup.set()
+
+
+class TelegramGateway:
+    # Every outbound Telegram call of one session goes through here: a per-bot bucket, then the
+    # session bucket. FloodWait is imposed on the account, so it blocks the whole session bucket.
+    def __init__(self, session_name):
+        self.session_name = session_name
+        self.session_bucket = TokenBucket(SESSION_RATE, SESSION_BURST)
+        self.bot_buckets = {}
+        self.wait_times = Histogram()
+        self.flood_waits = 0
+        tracer.collectors.append(self.metric_lines)
+
+    def bot_bucket(self, bot_username):
+        bot_username = bot_username.lower()
+        if bot_username not in self.bot_buckets:
+            self.bot_buckets[bot_username] = TokenBucket(BOT_RATE, BOT_BURST)
+        return self.bot_buckets[bot_username]
+
+    def queue_depth(self):
+        return len(self.session_bucket.waiters) + sum(len(bucket.waiters) for bucket in self.bot_buckets.values())
+
+    async def call(self, bot_username, priority, request):
+        while True:
+            started = time.monotonic()
+            await self.bot_bucket(bot_username).acquire(priority)
+            await self.session_bucket.acquire(priority)
+            self.wait_times.observe(time.monotonic() - started)
+            try:
+                return await request()
+            except FloodWait as e:
+                self.flood_waits += 1
+                self.session_bucket.block(e.value)
+                # Short waits are sat out here; longer ones go back to the pool so it can fail over
+                if e.value > FLOOD_RETRY_LIMIT:
+                    raise
+                print(f"FloodWait of {e.value} seconds on {self.session_name}, retrying after it.")
+
+    def summary(self):
+        p95 = self.wait_times.quantile(0.95)
+        wait = f"wait p95 <= {p95}s" if p95 is not None else "no calls yet"
+        return f"{self.session_name}: queue {self.queue_depth()}, {wait}, {self.flood_waits} flood waits"
+
+    def metric_lines(self):
+        labels = f'session="{self.session_name}"'
+        lines = [f"whale_telegram_queue_depth{{{labels}}} {self.queue_depth()}"]
+        lines.append(f"whale_telegram_flood_waits_total{{{labels}}} {self.flood_waits}")
+        return lines + self.wait_times.metric_lines("whale_telegram_wait_seconds", labels)
@@ -0,0 +1,53 @@
+import os
+import gzip
+import json
+import time
+
+
+RECORD_DIR = os.getenv("RECORD_DIR", "")
+RECORD_FLUSH_INTERVAL = float(os.getenv("RECORD_FLUSH_INTERVAL", "5"))
+
+
+def recording_filename(directory, epoch):
+    # Never appended to by a later run: a run killed mid-write leaves its file without a gzip trailer
+    return os.path.join(directory, time.strftime("whalewatch-%Y%m%d-%H%M%S", time.gmtime(epoch)) + f"-{os.getpid()}.jsonl.gz")
+
+
+class Recorder:
+    # Writes every new whalewatch transaction, exactly as the API returned it plus a "recorded_at" key, to
+    # a gzipped JSONL file of its own per run and UTC day. The buffer is flushed every RECORD_FLUSH_INTERVAL
+    # seconds, so a crash loses at most that much and the backtest reads the file up to the damage.
+    def __init__(self, directory=RECORD_DIR):
+        self.directory = directory
+        self.day = None
+        self.file = None
+        self.last_flush = time.monotonic()
+        self.recorded = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, raw_transactions):
+        if not raw_transactions:
+            return
+        now = time.time()
+        day = time.strftime("%Y%m%d", time.gmtime(now))
+        if day != self.day:
+            self.close()
+            self.day = day
+            self.file = gzip.open(recording_filename(self.directory, now), "wb")
+
+        self.file.write(b"".join(
+            json.dumps({**data, "recorded_at": now}).encode() + b"\n" for data in raw_transactions
+        ))
+        self.recorded += len(raw_transactions)
+        if time.monotonic() - self.last_flush >= RECORD_FLUSH_INTERVAL:
+            self.file.flush()
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def create_recorder():
+    return Recorder() if RECORD_DIR else None
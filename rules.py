@@ -0,0 +1,138 @@
+import os
+import json
+import asyncio
+
+
+RULES_FILE = os.getenv("RULES_FILE", "rules.json")
+RULES_RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", "2"))
+# Safety filters: a rules file adds to the .env blacklist instead of replacing it
+UNION_KEYS = ("deny_whales", "deny_tokens")
+
+
+def normalize_names(names):
+    return frozenset(name.strip().upper() for name in names if name.strip())
+
+
+def string_list(config, key):
+    # A bare string would otherwise be iterated character by character
+    values = config.get(key, [])
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"'{key}' must be a list of strings, got {values!r}")
+    return values
+
+
+def merge_config(base, override):
+    config = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key] = {**config[key], **value}
+        elif key in UNION_KEYS and isinstance(value, list) and isinstance(config.get(key), list):
+            config[key] = config[key] + [item for item in value if item not in config[key]]
+        else:
+            config[key] = value
+    return config
+
+
+def compile_rules(config, activity=None):
+    # Everything the predicate needs is resolved here and bound as closure locals, so evaluating a
+    # transaction is a handful of set/dict lookups and two comparisons
+    defaults = config.get("defaults", {})
+    confluence_seconds = defaults.get("confluence_seconds")
+    default_thresholds = (
+        float(defaults.get("min_amount", 0)),
+        float(defaults.get("max_market_cap", float("inf"))),
+        float(defaults["sol_amount"]),
+        int(defaults.get("min_whales", 1)),
+        float(confluence_seconds) if confluence_seconds is not None else None,
+    )
+    if default_thresholds[2] <= 0:
+        raise ValueError("The default sol_amount must be greater than 0")
+
+    whale_thresholds = {}
+    for rule in config.get("rules", []):
+        whales = normalize_names(string_list(rule, "whales"))
+        if not whales:
+            raise ValueError(f"Rule {rule} needs a non-empty 'whales' list")
+        confluence_seconds = rule.get("confluence_seconds", default_thresholds[4])
+        thresholds = (
+            float(rule.get("min_amount", default_thresholds[0])),
+            float(rule.get("max_market_cap", default_thresholds[1])),
+            float(rule.get("sol_amount", default_thresholds[2])),
+            int(rule.get("min_whales", default_thresholds[3])),
+            float(confluence_seconds) if confluence_seconds is not None else None,
+        )
+        if thresholds[2] <= 0:
+            raise ValueError(f"Rule {rule} has a sol_amount that is not greater than 0")
+        for whale in whales:
+            whale_thresholds[whale] = thresholds
+
+    allow_whales = normalize_names(string_list(config, "allow_whales"))
+    deny_whales = normalize_names(string_list(config, "deny_whales"))
+    deny_tokens = frozenset(string_list(config, "deny_tokens"))
+    token_suffixes = tuple(string_list(config, "token_suffixes"))
+    get_thresholds = whale_thresholds.get
+    if activity is None and max(thresholds[3] for thresholds in [default_thresholds, *whale_thresholds.values()]) > 1:
+        raise ValueError("min_whales above 1 needs an activity store")
+
+    # Returns the SOL amount to buy with, or None when the buy doesn't qualify
+    def evaluate(transaction):
+        whale = transaction.whale_key
+        if whale in deny_whales or (allow_whales and whale not in allow_whales):
+            return None
+
+        contract_address = transaction.contract_address
+        if contract_address in deny_tokens or (token_suffixes and not contract_address.endswith(token_suffixes)):
+            return None
+
+        amount = transaction.amount
+        market_cap = transaction.market_cap
+        if amount is None or market_cap is None:
+            return None
+
+        min_amount, max_market_cap, sol_amount, min_whales, confluence_seconds = get_thresholds(whale, default_thresholds)
+        if amount < min_amount or market_cap > max_market_cap:
+            return None
+        # Confluence: enough distinct whales bought this token within confluence_seconds
+        if min_whales > 1 and activity.distinct_whales(contract_address, confluence_seconds, transaction.epoch) < min_whales:
+            return None
+        return sol_amount
+
+    return evaluate
+
+
+class RuleEngine:
+    # env_config holds the .env settings; keys in the rules file take precedence over them, except the
+    # deny lists, which are combined
+    def __init__(self, env_config, filename=RULES_FILE, activity=None):
+        self.env_config = env_config
+        self.filename = filename
+        self.activity = activity
+        self.mtime = None
+        self.evaluate = compile_rules(env_config, activity)
+        self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.filename).st_mtime
+        except FileNotFoundError:
+            if self.mtime is not None:
+                print(f"{self.filename} was removed. Falling back to the .env buy criteria.")
+                self.evaluate = compile_rules(self.env_config, self.activity)
+                self.mtime = None
+            return
+        if mtime == self.mtime:
+            return
+
+        try:
+            with open(self.filename, "r") as file:
+                config = merge_config(self.env_config, json.load(file))
+            self.evaluate = compile_rules(config, self.activity)
+            print(f"Loaded buy rules from {self.filename}.")
+        except Exception as e:
+            print(f"Error loading {self.filename}, keeping the previous rules: {e}")
+        self.mtime = mtime
+
+    async def watch(self, interval=RULES_RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.reload()
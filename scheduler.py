@@ -0,0 +1,82 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+
+
+ORDER_PRIORITY = os.getenv("ORDER_PRIORITY", "whale_size").strip().lower()
+MAX_ORDER_AGE = float(os.getenv("MAX_ORDER_AGE", "30"))
+
+# Smaller keys run first; ties fall back to arrival order
+PRIORITIES = {
+    "whale_size": lambda transaction: -transaction.amount,
+    "market_cap": lambda transaction: transaction.market_cap,
+    "freshest": lambda transaction: -transaction.epoch,
+    "fifo": lambda transaction: 0,
+}
+
+
+class BuyOrder:
+    __slots__ = ("transaction", "trace", "sol_amount")
+
+    def __init__(self, transaction, trace, sol_amount):
+        self.transaction = transaction
+        self.trace = trace
+        self.sol_amount = sol_amount
+
+
+class BuyScheduler:
+    # Pending buys ordered by ORDER_PRIORITY. A signal older than MAX_ORDER_AGE (measured from the
+    # whale's API timestamp) is handed to on_expired instead of being executed late.
+    def __init__(self, on_expired, priority=ORDER_PRIORITY, max_age=MAX_ORDER_AGE):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid ORDER_PRIORITY value: {priority}. Use one of {', '.join(PRIORITIES)}.")
+        self.score = PRIORITIES[priority]
+        self.priority = priority
+        self.max_age = max_age
+        self.on_expired = on_expired
+        self.heap = []
+        self.sequence = itertools.count()
+        self.not_empty = asyncio.Event()
+        self.executed = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def is_expired(self, order, now):
+        return self.max_age and now - order.transaction.epoch > self.max_age
+
+    def expire(self, order):
+        self.expired += 1
+        print(f"Dropped stale buy for {order.transaction.contract_address}: signal older than {self.max_age:.0f}s.")
+        self.on_expired(order)
+
+    def put(self, transaction, trace, sol_amount):
+        order = BuyOrder(transaction, trace, sol_amount)
+        if self.is_expired(order, time.time()):
+            self.expire(order)
+            return False
+        heapq.heappush(self.heap, (self.score(transaction), next(self.sequence), order))
+        self.not_empty.set()
+        return True
+
+    async def get(self):
+        while True:
+            while not self.heap:
+                self.not_empty.clear()
+                await self.not_empty.wait()
+
+            order = heapq.heappop(self.heap)[2]
+            if self.is_expired(order, time.time()):
+                self.expire(order)
+                continue
+            self.executed += 1
+            return order
+
+    def summary(self):
+        return (
+            f"Scheduler: {len(self.heap)} pending by {self.priority}, {self.executed} executed, "
+            f"{self.expired} expired (max age {self.max_age:.0f}s)"
+        )
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+from config import settings
+from poller import whalewatch_poller, starting_cursor, save_cursor
+from feed import FeedServer
+from claims import ContractClaims
+
+
+SUPERVISOR_FILE = os.getenv("SUPERVISOR_FILE", "supervisor.json")
+SUPERVISOR_WORKERS = int(os.getenv("SUPERVISOR_WORKERS", "2"))
+FEED_SOCKET = os.path.abspath(os.getenv("FEED_SOCKET", "whale_feed.sock"))
+SUPERVISOR_CLAIMS_FILE = os.path.abspath(settings.claims_file or "claims.db")
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "60"))
+WORKER_RESTART_DELAY = float(os.getenv("WORKER_RESTART_DELAY", "5"))
+WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "10"))
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def load_workers(filename=SUPERVISOR_FILE):
+    # Either an explicit list of workers (see supervisor.example.json) or SUPERVISOR_WORKERS workers in one
+    # account group, with the session files dealt out between them
+    try:
+        with open(filename, "r") as file:
+            workers = json.load(file)["workers"]
+    except FileNotFoundError:
+        from telegram_bot import SessionManager
+        sessions = SessionManager().parse_sessions()
+        count = max(1, min(SUPERVISOR_WORKERS, len(sessions)))
+        workers = [{"name": f"worker{index + 1}", "sessions": sessions[index::count]} for index in range(count)]
+
+    names = set()
+    for worker in workers:
+        if not worker.get("name") or worker["name"] in names:
+            raise ValueError(f"Every worker in {filename} needs a unique name: {worker}")
+        names.add(worker["name"])
+    return workers
+
+
+def worker_env(worker, index):
+    env = dict(os.environ)
+    name = worker["name"]
+    env.update({
+        "WORKER_NAME": name,
+        "ACCOUNT_GROUP": worker.get("account_group", "default"),
+        "FEED_SOCKET": FEED_SOCKET,
+        "CLAIMS_FILE": SUPERVISOR_CLAIMS_FILE,
+        # Each worker journals and traces on its own so open positions never mix between accounts
+        "JOURNAL_FILE": f"trades-{name}.db",
+        "TRACE_FILE": f"traces-{name}.jsonl",
+        "HEADLESS": "True",
+        "PYTHONUNBUFFERED": "1",
+    })
+    if worker.get("sessions"):
+        env["SESSIONS"] = ",".join(worker["sessions"])
+    if int(env.get("METRICS_PORT") or 0):
+        env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + index)
+    env.update({key: str(value) for key, value in worker.get("env", {}).items()})
+    return env
+
+
+class WorkerProcess:
+    # One main.py child; its output is prefixed with its name and it is restarted if it dies
+    def __init__(self, name, env):
+        self.name = name
+        self.env = env
+        self.process = None
+        self.stopping = False
+
+    async def relay_output(self):
+        async for line in self.process.stdout:
+            sys.stdout.write(f"[{self.name}] {line.decode(errors='replace')}")
+            sys.stdout.flush()
+
+    async def run(self):
+        while not self.stopping:
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, MAIN_SCRIPT, env=self.env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+            )
+            await self.relay_output()
+            returncode = await self.process.wait()
+            if self.stopping:
+                return
+            print(f"Worker {self.name} exited with code {returncode}. Restarting in {WORKER_RESTART_DELAY:.0f}s.")
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+
+    async def stop(self):
+        self.stopping = True
+        if self.process is None or self.process.returncode is not None:
+            return
+        # SIGINT lets the worker close its journal and Telegram sessions; Windows can only terminate
+        if os.name == "nt":
+            self.process.terminate()
+        else:
+            self.process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(self.process.wait(), WORKER_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"Worker {self.name} did not stop in time, killing it.")
+            self.process.kill()
+            await self.process.wait()
+
+
+async def supervise(url=settings.whalewatch_url):
+    workers = load_workers()
+    if not settings.save_bought_coins:
+        # Claims only outlive a run when bought coins are meant to be skipped on the next one
+        claims = ContractClaims(SUPERVISOR_CLAIMS_FILE, None, "supervisor")
+        claims.reset()
+        claims.close()
+
+    last_id, cutoff_time = starting_cursor()
+    server = FeedServer(FEED_SOCKET)
+    await server.start()
+    processes = [WorkerProcess(worker["name"], worker_env(worker, index)) for index, worker in enumerate(workers)]
+    tasks = [asyncio.create_task(process.run()) for process in processes]
+    poller = whalewatch_poller(url)
+    try:
+        await poller.start()
+        connected = await server.wait_for_workers(len(processes), WORKER_START_TIMEOUT)
+        print(f"{connected}/{len(processes)} workers connected to the whale feed.")
+
+        while True:
+            transactions = await poller.poll(last_id, cutoff_time)
+            server.publish(transactions)
+            for transaction in reversed(transactions):
+                if transaction.id:
+                    last_id, cutoff_time = transaction.id, transaction.epoch
+                    save_cursor(last_id, transaction.timestamp)
+                    break
+            await poller.wait()
+
+    except asyncio.CancelledError:
+        print("Supervisor interrupted.")
+    finally:
+        await asyncio.gather(*(process.stop() for process in processes))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await poller.close()
+        await server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(supervise())
+    except KeyboardInterrupt:
+        print("Supervisor stopped by User")
@@ -1,15 +1,26 @@
 import os
+import re
+import time
 import asyncio
+import itertools
+from collections import deque
 from pyrogram import Client
-from dotenv import load_dotenv
+from pyrogram.errors import FloodWait
+from pyrogram.handlers import MessageHandler, EditedMessageHandler
+from config import settings, BOT_USERNAMES
+from rate_limiter import TelegramGateway, PRIORITY_BUY, PRIORITY_ORDER
 
 
-class SessionManager:
-    def __init__(self, workdir='sessions'):
-        load_dotenv()
+BOT_RESPONSE_TIMEOUT = float(os.getenv("BOT_RESPONSE_TIMEOUT", "5"))
+TRADE_STEP_TIMEOUT = float(os.getenv("TRADE_STEP_TIMEOUT", "10"))
+TRADE_STEP_RETRIES = int(os.getenv("TRADE_STEP_RETRIES", "2"))
+BUY_CONFIRM_TIMEOUT = float(os.getenv("BUY_CONFIRM_TIMEOUT", "30"))
+
 
-        self.api_id = os.getenv('TELEGRAM_API_ID')
-        self.api_hash = os.getenv('TELEGRAM_API_HASH')
+class SessionManager:
+    def __init__(self, workdir=settings.sessions_dir):
+        self.api_id = settings.api_id
+        self.api_hash = settings.api_hash
         self.workdir = workdir
 
     def parse_sessions(self):
@@ -17,6 +28,11 @@ class SessionManager:
         for file in os.listdir(self.workdir):
             if file.endswith(".session"):
                 sessions.append(file.replace(".session", ""))
+        if settings.sessions:
+            missing = set(settings.sessions) - set(sessions)
+            if missing:
+                print(f"SESSIONS lists sessions with no session file: {', '.join(sorted(missing))}")
+            sessions = [session for session in sessions if session in settings.sessions]
 
         print(f"Found {len(sessions)} session files!")
         return sessions
@@ -30,105 +46,198 @@ class SessionManager:
         return sessions[0]
 
 
-def get_bot_username():
-    bot_usernames = [
-        "mcqueen_bonkbot",
-        "bonkbot_bot",
-        "monza_bonkbot",
-        "furiosa_bonkbot",
-        "neo_bonkbot",
-        "sonic_bonkbot"
-    ]
+def message_text(message):
+    return message.text or message.caption or ""
 
-    bot_index = os.getenv("BOT_TO_USE", "1")
-    try:
-        bot_index = int(bot_index) - 1  # Converts to zero-based index
-        if bot_index < 0 or bot_index >= len(bot_usernames):
-            raise ValueError
-        return bot_usernames[bot_index]
-    except ValueError:
-        print(f"Invalid BOT_TO_USE value: {bot_index + 1}. Please set it to a number between 1 and {len(bot_usernames)} in your .env file.")
-        raise
+
+def find_button(message, button_text):
+    if not (hasattr(message, 'reply_markup') and message.reply_markup and hasattr(message.reply_markup, 'inline_keyboard')):
+        return None
+    for row in message.reply_markup.inline_keyboard:
+        for button in row:
+            if button.text == button_text:
+                return button
+    return None
+
+
+def make_matcher(target):
+    if callable(target):
+        return target
+    if isinstance(target, re.Pattern):
+        return lambda message: target.search(message_text(message)) is not None
+    return lambda message: target in message_text(message)
+
+
+class ResponseDispatcher:
+    # Resolves waiters from pyrogram's update handlers instead of polling get_chat_history.
+    # Every bot message (new or edited) gets an arrival sequence number; each outbound action
+    # records the current sequence so a waiter only accepts replies that arrived after it.
+    def __init__(self, client, history_size=10):
+        self.client = client
+        self.history_size = history_size
+        self.sequence = itertools.count(1)
+        self.last_sequence = 0
+        self.action_marks = {}
+        self.recent_messages = {}
+        self.waiters = []
+        self.conversation_locks = {}
+
+        client.add_handler(MessageHandler(self.on_message), group=-1)
+        client.add_handler(EditedMessageHandler(self.on_message), group=-1)
+
+    async def on_message(self, client, message):
+        if message.outgoing or not (message.from_user and message.from_user.is_bot):
+            return
+        if not (message.chat and message.chat.username):
+            return
+
+        bot_username = message.chat.username.lower()
+        self.last_sequence = next(self.sequence)
+        history = self.recent_messages.setdefault(bot_username, deque(maxlen=self.history_size))
+        history.append((self.last_sequence, message))
+
+        for waiter_bot, matcher, future in list(self.waiters):
+            if waiter_bot == bot_username and not future.done() and matcher(message):
+                future.set_result(message)
+
+    def conversation_lock(self, bot_username):
+        # A bot conversation is strictly sequential; concurrent flows on one bot would steal each other's replies
+        return self.conversation_locks.setdefault(bot_username.lower(), asyncio.Lock())
+
+    def mark_action(self, bot_username):
+        self.action_marks[bot_username.lower()] = self.last_sequence
+
+    def find_recent(self, bot_username, matcher):
+        bot_username = bot_username.lower()
+        mark = self.action_marks.get(bot_username, 0)
+        for sequence, message in reversed(self.recent_messages.get(bot_username, ())):
+            if sequence <= mark:
+                break
+            if matcher(message):
+                return message
+        return None
+
+    async def wait_for(self, bot_username, target, timeout=BOT_RESPONSE_TIMEOUT):
+        bot_username = bot_username.lower()
+        matcher = make_matcher(target)
+
+        message = self.find_recent(bot_username, matcher)
+        if message is not None:
+            return message
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (bot_username, matcher, future)
+        self.waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.waiters.remove(waiter)
+
+    async def wait_for_button(self, bot_username, button_text, timeout=BOT_RESPONSE_TIMEOUT):
+        return await self.wait_for(bot_username, lambda message: find_button(message, button_text) is not None, timeout)
 
 
 def create_client(session_name):
     session_manager = SessionManager()
-    return Client(
+    client = Client(
         name=session_name,
         api_id=session_manager.api_id,
         api_hash=session_manager.api_hash,
         workdir=session_manager.workdir
     )
+    client.response_dispatcher = ResponseDispatcher(client)
+    client.gateway = TelegramGateway(session_name)
+    return client
 
 
-async def send_message(client, message_text, target_username):
-    try:
-        sent_message = await client.send_message(
+async def send_message(client, message_text, target_username, priority=PRIORITY_BUY):
+    async def request():
+        # Marked once the gateway lets the call through, so replies to earlier actions can't match
+        client.response_dispatcher.mark_action(target_username)
+        return await client.send_message(
             chat_id=target_username,
             text=message_text
         )
+
+    try:
+        sent_message = await client.gateway.call(target_username, priority, request)
         print(f"Contract Address sent successfully to {target_username}")
         return sent_message.id
 
+    except FloodWait:
+        raise
     except Exception as e:
         print(f"Error sending message to {target_username}: {e}")
 
 
-async def reply_message(client, message_text, message_id, target_username):
-    try:
-        sent_message = await client.send_message(
+async def reply_message(client, message_text, message_id, target_username, priority=PRIORITY_BUY):
+    async def request():
+        client.response_dispatcher.mark_action(target_username)
+        return await client.send_message(
             chat_id=target_username,
             text=message_text,
             reply_to_message_id=message_id
         )
+
+    try:
+        sent_message = await client.gateway.call(target_username, priority, request)
         print(f"Reply message sent successfully to {target_username}")
         return sent_message.id
 
+    except FloodWait:
+        raise
     except Exception as e:
         print(f"Error sending reply message to {target_username}: {e}")
 
 
 async def print_received_message(client, bot_username):
+    history = client.response_dispatcher.recent_messages.get(bot_username.lower())
+    if history:
+        print(f"Last message from {bot_username}: {message_text(history[-1][1])}")
+    else:
+        print(f"No message received from {bot_username} yet.")
+
+
+async def interact_with_button(client, button_text, bot_username, timeout=BOT_RESPONSE_TIMEOUT, priority=PRIORITY_BUY, message=None):
+    # message, when given, is clicked again instead of waiting for a new message carrying the button
     try:
-        async for message in client.get_chat_history(bot_username, limit=1):
-            print(f"Last message from {bot_username}: {message.text}")
+        dispatcher = client.response_dispatcher
+        if message is None:
+            message = await dispatcher.wait_for_button(bot_username, button_text, timeout)
+        if message is None:
+            print(f"{button_text} button did not appear on {bot_username} within {timeout} seconds.")
+            return None
 
-    except Exception as e:
-        print(f"Error fetching the bot's reply: {e}")
+        button = find_button(message, button_text)
 
+        async def request():
+            dispatcher.mark_action(bot_username)
+            return await client.request_callback_answer(
+                chat_id=bot_username,
+                message_id=message.id,
+                callback_data=button.callback_data
+            )
 
-async def interact_with_button(client, button_text, bot_username):
-    try:
-        async for message in client.get_chat_history(bot_username, limit=1):
-            if hasattr(message, 'reply_markup') and message.reply_markup:
-                for row in message.reply_markup.inline_keyboard:
-                    for button in row:
-                        if button.text == button_text:
-                            result = await client.request_callback_answer(
-                                chat_id=bot_username,
-                                message_id=message.id,
-                                callback_data=button.callback_data
-                            )
-
-                            print(f"{button_text} button clicked successfully on {bot_username}!")
-                            return result
-            break
+        result = await client.gateway.call(bot_username, priority, request)
+
+        print(f"{button_text} button clicked successfully on {bot_username}!")
+        return result
 
+    except FloodWait:
+        raise
     except Exception as e:
         print(f"Error clicking {button_text} button on {bot_username}: {e}")
 
 
 async def wait_for_bot_response(client, bot_username, timeout=1, target_text="Reply with the amount you wish to buy", retries=5):
     try:
-        for _ in range(retries):
-            async for message in client.get_chat_history(bot_username, limit=1):
-                if message.from_user and message.from_user.is_bot and target_text in message.text:
-                    return message.id
-
-            print(f"Bot '{bot_username}' hasn't responded yet, retrying in {timeout} seconds...")
-            await asyncio.sleep(timeout)
+        message = await client.response_dispatcher.wait_for(bot_username, target_text, timeout * retries)
+        if message is not None:
+            return message.id
 
-        print(f"No response from bot '{bot_username}' containing '{target_text}' within {retries} attempts.")
+        print(f"No response from bot '{bot_username}' containing '{target_text}' within {timeout * retries} seconds.")
         return None
 
     except Exception as e:
@@ -136,80 +245,202 @@ async def wait_for_bot_response(client, bot_username, timeout=1, target_text="Re
         return None
 
 
-async def buy_coin(client, contract_address, bot_username):
+class TradeStep:
+    def __init__(self, name, action, expect, next_state, timeout=TRADE_STEP_TIMEOUT, retries=TRADE_STEP_RETRIES,
+                 action_stage=None, reply_stage=None):
+        self.name = name
+        self.action = action
+        self.expect = expect
+        self.next_state = next_state
+        self.timeout = timeout
+        self.retries = retries
+        # Trace stages stamped when the action went out and when the expected reply came back
+        self.action_stage = action_stage
+        self.reply_stage = reply_stage
+
+
+class TradeFlow:
+    # buy -> limit -> percent -> trigger -> confirm, each transition fired by the bot's reply.
+    # Steps that send text to the bot never retry: resending an amount could buy twice.
+    def __init__(self, client, contract_address, bot_username, sol_amount, limit_order=None, trace=None):
+        self.client = client
+        self.contract_address = contract_address
+        self.bot_username = bot_username
+        self.sol_amount = sol_amount
+        self.limit_order = limit_order
+        self.trace = trace
+        self.state = "send_ca"
+        self.message = None
+        self.attempt = 0
+        self.buy_sent = False
+        # Set as soon as the amount goes out: an error after that can't tell whether the bot got it
+        self.amount_attempted = False
+        self.flood_wait = None
+        self.step_timings = {}
+        self.total_time = 0.0
+        self.steps = self.build_steps()
+
+    def build_steps(self):
+        after_buy = "click_limit" if self.limit_order else "done"
+        steps = [
+            TradeStep("send_ca", self.send_contract_address, self.contract_address, "click_buy", action_stage="ca_sent", reply_stage="bot_ack"),
+            TradeStep("click_buy", lambda: self.click("Buy X SOL"), "Reply with the amount you wish to buy", "send_amount"),
+            TradeStep(
+                "send_amount", self.send_amount, "Profit" if self.limit_order else None, after_buy,
+                timeout=BUY_CONFIRM_TIMEOUT, retries=0, action_stage="buy_reply_sent"
+            ),
+        ]
+        if self.limit_order:
+            percent, multiple = self.limit_order
+            steps += [
+                TradeStep("click_limit", lambda: self.click("Limit"), lambda message: find_button(message, "Limit Sell X %") is not None, "click_limit_percent"),
+                TradeStep("click_limit_percent", lambda: self.click("Limit Sell X %"), "Reply with the % you wish to limit sell", "send_percent"),
+                TradeStep("send_percent", lambda: self.reply(f"{percent}%"), "Enter a trigger", "send_trigger", retries=0),
+                TradeStep("send_trigger", lambda: self.reply(f"{multiple}x"), "Take Profit Sell", "confirm", retries=0),
+                TradeStep("confirm", lambda: self.click("Confirm"), "successfully placed", "done", retries=0, reply_stage="limit_placed"),
+            ]
+        return {step.name: step for step in steps}
+
+    async def send_contract_address(self):
+        return await send_message(self.client, f"/start=ref_ibayi_ca_{self.contract_address}", self.bot_username)
+
+    async def send_amount(self):
+        print(f"Buying coin with {self.sol_amount} SOL on {self.bot_username}")
+        self.amount_attempted = True
+        try:
+            message_id = await self.reply(str(self.sol_amount))
+        except FloodWait:
+            # Telegram refused the message, so the amount never reached the bot
+            self.amount_attempted = False
+            raise
+        self.buy_sent = message_id is not None
+        return message_id
+
+    def priority(self):
+        # Once the buy is out, the rest of the flow yields to other sessions' buys
+        return PRIORITY_ORDER if self.buy_sent else PRIORITY_BUY
+
+    async def click(self, button_text):
+        # The bot never resends the message carrying the button, and the first click's mark hides it from
+        # wait_for_button, so a retry clicks it on the message the previous step matched
+        message = self.message if self.attempt and find_button(self.message, button_text) is not None else None
+        return await interact_with_button(self.client, button_text, self.bot_username, TRADE_STEP_TIMEOUT, self.priority(), message)
+
+    async def reply(self, text):
+        return await reply_message(self.client, text, self.message.id, self.bot_username, self.priority())
+
+    def mark(self, stage):
+        if stage and self.trace is not None:
+            self.trace.mark(stage)
+
+    async def run_step(self, step):
+        for attempt in range(step.retries + 1):
+            self.attempt = attempt
+            if attempt:
+                print(f"Retrying {step.name} on {self.bot_username} ({attempt}/{step.retries})...")
+
+            if await step.action() is None:
+                continue
+            self.mark(step.action_stage)
+            if step.expect is None:
+                return True
+
+            message = await self.client.response_dispatcher.wait_for(self.bot_username, step.expect, step.timeout)
+            if message is not None:
+                self.mark(step.reply_stage)
+                self.message = message
+                return True
+            print(f"{self.bot_username} did not answer {step.name} within {step.timeout} seconds.")
+        return False
+
+    async def run(self):
+        flow_started = time.perf_counter()
+        while self.state in self.steps:
+            step = self.steps[self.state]
+            step_started = time.perf_counter()
+            try:
+                succeeded = await self.run_step(step)
+            except FloodWait as e:
+                print(f"FloodWait of {e.value} seconds on {self.bot_username} during {step.name}.")
+                self.flood_wait = e.value
+                succeeded = False
+            self.step_timings[step.name] = time.perf_counter() - step_started
+
+            if not succeeded:
+                print(f"Trade for {self.contract_address} stopped at {step.name}.")
+                self.state = "failed"
+                break
+            self.state = step.next_state
+
+        self.total_time = time.perf_counter() - flow_started
+        if self.state == "done" and self.limit_order:
+            print("Limit order successfully placed")
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.step_timings.items())
+        print(f"Trade timings on {self.bot_username}: {timings} (total {self.total_time:.2f}s)")
+        return self
+
+
+class SellFlow(TradeFlow):
+    # CA -> "Sell 100%" in one click, or CA -> "Sell X %" -> percent for partial sells.
+    # Must run on the session and bot whose wallet holds the coin.
+    def __init__(self, client, contract_address, bot_username, percent, trace=None):
+        self.percent = percent
+        self.sold = False
+        super().__init__(client, contract_address, bot_username, None, trace=trace)
+
+    def build_steps(self):
+        steps = [TradeStep("send_ca", self.send_contract_address, self.contract_address, "click_sell")]
+        if self.percent >= 100:
+            steps.append(TradeStep("click_sell", self.sell_all, None, "done"))
+        else:
+            steps += [
+                TradeStep("click_sell", lambda: self.click("Sell X %"), "Reply with the % you wish to sell", "send_percent"),
+                TradeStep("send_percent", self.send_percent, None, "done", retries=0),
+            ]
+        return {step.name: step for step in steps}
+
+    def priority(self):
+        return PRIORITY_ORDER
+
+    async def sell_all(self):
+        result = await self.click("Sell 100%")
+        self.sold = result is not None
+        return result
+
+    async def send_percent(self):
+        print(f"Selling {self.percent}% of {self.contract_address} on {self.bot_username}")
+        message_id = await self.reply(f"{self.percent}%")
+        self.sold = message_id is not None
+        return message_id
+
+
+async def sell_coin(client, contract_address, bot_username, percent):
     try:
-        message_text = f"/start=ref_ibayi_ca_{contract_address}"
-        await send_message(client, message_text, bot_username)
-        
-        check_coin_details = await wait_for_bot_response(client, bot_username, target_text=contract_address)
-
-        if check_coin_details is not None:
-            # Click "Buy X SOL" button
-            button_result = await interact_with_button(client, "Buy X SOL", bot_username)
-            
-            if button_result is not None:
-                print(f"Waiting for {bot_username} response...")
-                bot_response_message_id = await wait_for_bot_response(client, bot_username)
-
-                if bot_response_message_id is not None:
-                    sol_amount = float(os.getenv("SOL_AMOUNT", "0.005"))
-                    if sol_amount <= 0:
-                        print("SOL_AMOUNT must be greater than 0.")
-                        return
-                    
-                    message_text = str(sol_amount)
-                    print(f"Buying coin with {sol_amount} SOL on {bot_username}")
-                    await reply_message(client, message_text, bot_response_message_id, bot_username)
-
-
-                    await asyncio.sleep(7)
-
-                    SET_LIMIT_ORDER = os.getenv("SET_LIMIT_ORDER", "False").strip().lower() == "true"
-                    
-                    try:
-                        PERCENT_COINS_LIMIT_SELL = int(os.getenv("PERCENT_COINS_LIMIT_SELL", "100"))
-                        MULTIPLE_CHANGE_LIMIT_SELL = float(os.getenv("MULTIPLE_CHANGE_LIMIT_SELL", "1"))
-                        if MULTIPLE_CHANGE_LIMIT_SELL < 0:
-                            raise ValueError("Limit sell percentage must be a number between 0")
-                    except ValueError as e:
-                        print(f"Invalid percentage value for limit order: {e}")
-                        return
-                    
-                    if SET_LIMIT_ORDER:
-                        check_order_message = await wait_for_bot_response(client, bot_username=bot_username, target_text="Profit")
-                        if check_order_message is not None:
-                            await interact_with_button(client, button_text="Limit", bot_username=bot_username)
-                            await asyncio.sleep(2)
-                            await interact_with_button(client, button_text="Limit Sell X %", bot_username=bot_username)
-                            await asyncio.sleep(2)
-                            check_first_limit_message = await wait_for_bot_response(client, bot_username=bot_username, target_text="Reply with the % you wish to limit sell")
-                            if check_first_limit_message is not None:
-                                percent_coins_limit_sell = f'{PERCENT_COINS_LIMIT_SELL}%'
-                                message_text = percent_coins_limit_sell
-                                await reply_message(client, message_text, check_first_limit_message, target_username=bot_username)
-                                await asyncio.sleep(2)
-                                check_second_limit_message = await wait_for_bot_response(client, bot_username=bot_username, target_text="Enter a trigger")
-                                if check_second_limit_message is not None:
-                                    multiple_change_limit_sell = f'{MULTIPLE_CHANGE_LIMIT_SELL}x'
-                                    message_text = multiple_change_limit_sell
-                                    await reply_message(client, message_text, check_second_limit_message, target_username=bot_username)
-                                    await asyncio.sleep(2)
-                                    check_limit_confirm_message = await wait_for_bot_response(client, bot_username=bot_username, target_text="Take Profit Sell")
-                                    if check_limit_confirm_message is not None:
-                                        await interact_with_button(client, button_text="Confirm", bot_username=bot_username)
-                                        await asyncio.sleep(2)
-                                        check_limit_success_message = await wait_for_bot_response(client, bot_username=bot_username, target_text="successfully placed")
-                                        if check_limit_success_message is not None:
-                                            print("Limit order successfully placed")
-                    
-                        else:
-                            print("Failed to find the bot's response message.")
-                    else:
-                        print("Failed to find coin details. Skipping Buy X SOL interaction.")
-                    
+        flow = SellFlow(client, contract_address, bot_username, percent)
+        async with client.response_dispatcher.conversation_lock(bot_username):
+            return await flow.run()
+
+    except Exception as e:
+        print(f"Error in sell_coin: {e}")
+        return None
+
+
+async def buy_coin(client, contract_address, bot_username, trace=None, sol_amount=None, limit_order=None):
+    # The trade settings were validated once at startup; limit_order is (percent, multiple) or None
+    try:
+        if sol_amount is None:
+            sol_amount = settings.sol_amount
+        if sol_amount <= 0:
+            print("SOL_AMOUNT must be greater than 0.")
+            return None
+
+        flow = TradeFlow(client, contract_address, bot_username, sol_amount, limit_order, trace)
+        async with client.response_dispatcher.conversation_lock(bot_username):
+            return await flow.run()
 
     except Exception as e:
         print(f"Error in buy_coin: {e}")
+        return None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import bisect
+import logging
+from logging.handlers import RotatingFileHandler
+from aiohttp import web
+
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def percentile(samples, percent):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, like Prometheus' histogram_quantile
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def metric_lines(self, name, labels=""):
+        # Prometheus exposition: cumulative buckets, +Inf, _sum and _count; labels like 'stage="decision"'
+        bucket_labels = f"{labels}," if labels else ""
+        series_labels = f"{{{labels}}}" if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{bucket_labels}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{bucket_labels}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{series_labels} {self.sum}")
+        lines.append(f"{name}_count{series_labels} {self.count}")
+        return lines
+
+
+class Trace:
+    def __init__(self, transaction_id, contract_address, api_time=None):
+        self.transaction_id = transaction_id
+        self.contract_address = contract_address
+        self.stages = {}
+        if api_time is not None:
+            self.stages["api_timestamp"] = api_time
+
+    def mark(self, stage, at=None):
+        # First mark wins so a failed-over buy keeps the time of its first attempt
+        self.stages.setdefault(stage, at if at is not None else time.time())
+
+    def spans(self):
+        ordered = sorted(self.stages.items(), key=lambda item: item[1])
+        spans = {stage: at - previous_at for (_, previous_at), (stage, at) in zip(ordered, ordered[1:])}
+        if len(ordered) > 1:
+            spans["end_to_end"] = ordered[-1][1] - ordered[0][1]
+        return spans
+
+
+class Tracer:
+    def __init__(self, trace_file=TRACE_FILE):
+        self.histograms = {}
+        self.outcomes = {}
+        # Callables returning extra metric lines, e.g. the Telegram gateways' queue metrics
+        self.collectors = []
+        # Extra (method, path, handler) routes served next to /metrics, registered before start_server
+        self.routes = []
+        self.runner = None
+        self.logger = None
+        if trace_file:
+            self.logger = logging.getLogger("whale_traces")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(trace_file, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def start(self, transaction_id, contract_address, api_time=None):
+        return Trace(transaction_id, contract_address, api_time)
+
+    def histogram(self, stage):
+        if stage not in self.histograms:
+            self.histograms[stage] = Histogram()
+        return self.histograms[stage]
+
+    def finish(self, trace, outcome):
+        # API timestamps only have whole-second resolution, so the fetch_received span carries up to 1s of rounding
+        spans = trace.spans()
+        for stage, seconds in spans.items():
+            self.histogram(stage).observe(seconds)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+        if self.logger is not None:
+            self.logger.info(json.dumps({
+                "transaction_id": trace.transaction_id,
+                "contract_address": trace.contract_address,
+                "outcome": outcome,
+                "stages": trace.stages,
+                "spans": spans,
+            }))
+
+    def render_metrics(self):
+        lines = [
+            "# HELP whale_trade_stage_seconds Time from the previous stage to this one.",
+            "# TYPE whale_trade_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            lines += histogram.metric_lines("whale_trade_stage_seconds", f'stage="{stage}"')
+
+        lines += [
+            "# HELP whale_transactions_total Traced whale transactions by outcome.",
+            "# TYPE whale_transactions_total counter",
+        ]
+        for outcome, count in sorted(self.outcomes.items()):
+            lines.append(f'whale_transactions_total{{outcome="{outcome}"}} {count}')
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.render_metrics(), content_type="text/plain")
+
+    async def start_server(self, host=METRICS_HOST, port=METRICS_PORT):
+        if not port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        for method, path, handler in self.routes:
+            app.router.add_route(method, path, handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        print(f"Metrics available at http://{host}:{port}/metrics")
+
+    async def stop_server(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+tracer = Tracer()
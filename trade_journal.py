@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+from prettytable import PrettyTable
+
+
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "trades.db")
+# NORMAL is durable against process crashes and SIGKILL in WAL mode; FULL also survives power loss
+JOURNAL_SYNCHRONOUS = os.getenv("JOURNAL_SYNCHRONOUS", "NORMAL").strip().upper()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    contract_address TEXT NOT NULL,
+    symbol TEXT,
+    whale_name TEXT,
+    whale_amount REAL,
+    market_cap REAL,
+    sol_amount REAL,
+    session_name TEXT,
+    bot_username TEXT,
+    step_timings TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_contract_address ON trades (contract_address);
+CREATE TABLE IF NOT EXISTS blacklist (
+    contract_address TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS positions (
+    contract_address TEXT PRIMARY KEY,
+    opened_at REAL NOT NULL,
+    symbol TEXT,
+    whale_name TEXT,
+    entry_market_cap REAL NOT NULL,
+    sol_amount REAL NOT NULL,
+    session_name TEXT,
+    bot_username TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    closed_at REAL,
+    exit_market_cap REAL,
+    exit_reason TEXT,
+    sold_percent INTEGER
+);
+"""
+
+
+class TradeJournal:
+    def __init__(self, filename=JOURNAL_FILE):
+        # Autocommit: every buy is its own transaction and hits the WAL as soon as it is recorded
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={JOURNAL_SYNCHRONOUS}")
+        self.connection.executescript(SCHEMA)
+
+    def import_blacklist(self, filename="blacklist.txt"):
+        # blacklist.txt stays hand-editable; its entries are merged in on every start
+        try:
+            with open(filename, "r") as file:
+                contracts = [(line.strip(),) for line in file if line.strip()]
+        except FileNotFoundError:
+            return
+        self.connection.executemany("INSERT OR IGNORE INTO blacklist (contract_address) VALUES (?)", contracts)
+
+    def load_contracts(self):
+        rows = self.connection.execute(
+            "SELECT contract_address FROM trades UNION SELECT contract_address FROM blacklist"
+        )
+        return {row[0] for row in rows}
+
+    def record_buy(self, transaction, result):
+        self.connection.execute(
+            "INSERT INTO trades (created_at, contract_address, symbol, whale_name, whale_amount, market_cap,"
+            " sol_amount, session_name, bot_username, step_timings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                time.time(),
+                transaction.contract_address,
+                transaction.symbol,
+                transaction.whale_name,
+                transaction.amount,
+                transaction.market_cap,
+                result.sol_amount,
+                getattr(result.client, "name", None),
+                result.bot_username,
+                json.dumps(result.step_timings),
+            ),
+        )
+
+    def open_position(self, transaction, result):
+        # The token's market cap at the whale's buy is the entry price; with a fixed supply it moves 1:1 with price
+        opened_at = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO positions (contract_address, opened_at, symbol, whale_name, entry_market_cap,"
+            " sol_amount, session_name, bot_username) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                transaction.contract_address,
+                opened_at,
+                transaction.symbol,
+                transaction.whale_name,
+                transaction.market_cap,
+                result.sol_amount,
+                getattr(result.client, "name", None),
+                result.bot_username,
+            ),
+        )
+        return opened_at
+
+    def open_positions(self):
+        return self.connection.execute(
+            "SELECT contract_address, opened_at, symbol, whale_name, entry_market_cap, sol_amount, session_name, bot_username"
+            " FROM positions WHERE status = 'open' ORDER BY opened_at"
+        ).fetchall()
+
+    def close_position(self, contract_address, exit_market_cap, exit_reason, sold_percent):
+        self.connection.execute(
+            "UPDATE positions SET status = 'closed', closed_at = ?, exit_market_cap = ?, exit_reason = ?, sold_percent = ?"
+            " WHERE contract_address = ?",
+            (time.time(), exit_market_cap, exit_reason, sold_percent, contract_address),
+        )
+
+    def recent(self, limit=20):
+        return self.connection.execute(
+            "SELECT created_at, symbol, contract_address, whale_name, whale_amount, market_cap, sol_amount, bot_username"
+            " FROM trades ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    journal = TradeJournal()
+    table = PrettyTable()
+    table.field_names = ["Time", "Coin", "Contract Address", "Which Whale?", "Amount (USD)", "Market Cap (USD)", "SOL", "Bot"]
+    for created_at, symbol, contract_address, whale_name, whale_amount, market_cap, sol_amount, bot_username in journal.recent(int(sys.argv[1]) if len(sys.argv) > 1 else 20):
+        table.add_row([
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at)), symbol, contract_address, whale_name,
+            f"${whale_amount or 0:,.2f}", f"${market_cap or 0:,.2f}", sol_amount, bot_username,
+        ])
+    print(table)
+    journal.close()
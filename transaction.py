@@ -0,0 +1,92 @@
+import json
+import calendar
+from datetime import datetime
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+def parse_epoch(timestamp):
+    # fromisoformat is implemented in C and accepts the API's "%Y-%m-%dT%H:%M:%S" timestamps
+    return calendar.timegm(datetime.fromisoformat(timestamp).utctimetuple())
+
+
+def round_or_none(value):
+    return round(float(value), 2) if value is not None else None
+
+
+class Transaction:
+    # One whale buy, decoded once from the API response; everything downstream reads these attributes
+    __slots__ = (
+        "id", "timestamp", "epoch", "whale_name", "whale_key", "symbol", "contract_address", "amount", "market_cap"
+    )
+
+    def __init__(self, id, timestamp, epoch, whale_name, symbol, contract_address, amount, market_cap):
+        self.id = id
+        self.timestamp = timestamp
+        self.epoch = epoch
+        self.whale_name = whale_name
+        self.whale_key = whale_name.upper().strip()
+        self.symbol = symbol
+        self.contract_address = contract_address
+        self.amount = amount
+        self.market_cap = market_cap
+
+    def __repr__(self):
+        return f"Transaction({self.id!r}, {self.symbol!r}, {self.contract_address!r}, amount={self.amount}, market_cap={self.market_cap})"
+
+    @classmethod
+    def from_api(cls, data):
+        try:
+            swap_token = data["swap_token"]
+            timestamp = data["timestamp"]
+            whale_name = data["swap_whalewatch_list"]["name"]
+            symbol = swap_token["symbol"]
+            contract_address = swap_token["token_address"]
+            # A null here would only blow up downstream, in the rules or the poll loop
+            if not (isinstance(whale_name, str) and isinstance(symbol, str) and isinstance(contract_address, str)):
+                raise TypeError(f"whale name, symbol and token address must be strings: {whale_name!r}, {symbol!r}, {contract_address!r}")
+            return cls(
+                data.get("id"),
+                timestamp,
+                parse_epoch(timestamp),
+                whale_name,
+                symbol,
+                contract_address,
+                round_or_none(data.get("trade_amount_rounded")),
+                round_or_none(data.get("token_market_cap")),
+            )
+        except KeyError as e:
+            print(f"Missing key in transaction data: {e}")
+        except (TypeError, ValueError) as e:
+            print(f"Invalid transaction data: {e}")
+        return None
+
+    def to_feed(self):
+        # Same order as __init__, so Transaction(*row) rebuilds it on the other side of the supervisor's feed
+        return [
+            self.id, self.timestamp, self.epoch, self.whale_name, self.symbol, self.contract_address, self.amount, self.market_cap
+        ]
+
+    @property
+    def display_amount(self):
+        return f"${self.amount if self.amount is not None else 0.0:,.2f}"
+
+    @property
+    def display_market_cap(self):
+        return f"${self.market_cap:,.2f}" if self.market_cap is not None else "Unknown"
+
+
+def decode_transactions(body, raw=None):
+    # raw, when given, maps each decoded Transaction back to the dict it came from (for the recorder)
+    transactions = []
+    for data in json_loads(body).get("transactions") or []:
+        transaction = Transaction.from_api(data)
+        if transaction is not None:
+            transactions.append(transaction)
+            if raw is not None:
+                raw[transaction] = data
+    return transactions